@@ -0,0 +1,294 @@
+"""Headless benchmarks for the symbol builder generations.
+
+Builds a synthetic symbol folder, then times the same operations against
+each app generation's own classes:
+
+    palette_load     SymbolPalette.load_folder + first render (cold cache), including a background atlas build
+    palette_reload   the same again (warm cache, where a generation has one)
+    place            BoardCanvas.place_symbol for every board item, until every bitmap is on the canvas
+    scale            _apply_scale on every item, likewise including background resamples
+    inspector        Inspector.refresh with the board full
+    drag             click + N motion events + release through the real bindings
+
+Needs a display; with none set and Xvfb installed, one is started for the run.
+Results are JSON, so two commits can be compared:
+
+    python bench_symbols.py --out before.json
+    python bench_symbols.py --out after.json
+    python bench_symbols.py --compare before.json after.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent import futures
+
+from PIL import Image, ImageDraw
+
+GENERATIONS = ["symbol_builder_app", "symbol_builder_appV1", "symbol_builder_appV11", "symbol_builder_v12"]
+BENCHES = ["palette_load", "palette_reload", "place", "scale", "inspector", "drag"]
+SCHEMA_VERSION = 1
+
+
+# ---------- Synthetic data ----------
+def make_symbol_folder(folder, count, size, seed=0):
+    """``count`` RGBA PNGs of ``size`` with a coloured frame and glyph on transparency."""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    w, h = size
+    for i in range(count):
+        path = os.path.join(folder, f"Unit_{i}.png")
+        if os.path.exists(path):
+            continue
+        im = Image.new("RGBA", size, (0, 0, 0, 0))
+        d = ImageDraw.Draw(im)
+        colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+        m = max(2, w // 10)
+        d.rectangle((m, m + h // 8, w - m, h - m - h // 8), outline=colour, width=max(2, w // 40))
+        d.line((m, m + h // 8, w - m, h - m - h // 8), fill=colour, width=max(2, w // 60))
+        d.ellipse((w // 3, h // 3, 2 * w // 3, 2 * h // 3), fill=colour)
+        im.save(path, compress_level=1)
+    return folder
+
+
+# ---------- Display ----------
+def ensure_display():
+    """Start a throwaway Xvfb when there is no display; returns the process (or None)."""
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    if not shutil.which("Xvfb"):
+        sys.exit("No display: set DISPLAY, run under xvfb-run, or install Xvfb.")
+    display = f":{random.randrange(100, 900)}"
+    proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)  # give the server a moment to accept connections
+    return proc
+
+
+# ---------- Timing ----------
+def _ms(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def _summary(samples):
+    s = sorted(samples)
+    return {
+        "samples_ms": [round(v, 3) for v in samples],
+        "median_ms": round(statistics.median(s), 3),
+        "min_ms": round(s[0], 3),
+        "p95_ms": round(s[min(len(s) - 1, int(0.95 * len(s)))], 3),
+    }
+
+
+class GenerationBench:
+    """Runs every benchmark against one app module inside its own Tk root."""
+
+    def __init__(self, module_name, folder, items, drag_steps, repeat):
+        self.name = module_name
+        self.folder = folder
+        self.items = items
+        self.drag_steps = drag_steps
+        self.repeat = repeat
+
+    def run(self, benches):
+        import tkinter as tk
+        mod = importlib.import_module(self.name)
+        self.mod = mod
+        results = {}
+        for _ in range(self.repeat):
+            root = tk.Tk()
+            root.geometry("1500x900+0+0")
+            try:
+                for bench, ms in self._one_round(root, benches).items():
+                    results.setdefault(bench, []).append(ms)
+            finally:
+                root.destroy()
+        return results
+
+    def _one_round(self, root, benches):
+        mod = self.mod
+        out = {}
+        cache_dir = os.environ.get("SYMBOL_CACHE_DIR")
+
+        palette = mod.SymbolPalette(root, on_start_drag=lambda *a: None)
+        palette.pack(side="left", fill="y")
+        board = mod.BoardCanvas(root)
+        board.pack(side="left", fill="both", expand=True)
+        root.update()
+
+        def load():
+            palette.load_folder(self.folder)
+            # generations that build the atlas in the background: the timed work includes showing it
+            job = getattr(palette, "_atlas_job", None)
+            if job is not None:
+                futures.wait([job])
+            while getattr(palette, "_atlas_job", None) is not None:
+                root.update()  # until _poll_atlas picks the result up
+            root.update()
+
+        if "palette_load" in benches:
+            if cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            out["palette_load"] = _ms(load)
+        if "palette_reload" in benches:
+            out["palette_reload"] = _ms(load)
+
+        def settle():
+            # generations that resample on a worker pool: the timed work includes installing the results
+            drain = getattr(getattr(board, "view", None), "drain", None)
+            if drain is not None:
+                drain()
+            root.update()
+
+        paths = sorted(os.path.join(self.folder, n) for n in os.listdir(self.folder) if n.endswith(".png"))
+        rng = random.Random(1)
+        w, h = int(board.cget("width")), int(board.cget("height"))
+        spots = [(rng.randrange(80, w - 80), rng.randrange(80, h - 80)) for _ in range(self.items)]
+
+        def place():
+            for i, (x, y) in enumerate(spots):
+                p = paths[i % len(paths)]
+                board.place_symbol(os.path.basename(p), p, x, y)
+            settle()
+        t = _ms(place)
+        if "place" in benches:
+            out["place"] = t
+
+        if "scale" in benches and hasattr(board, "_apply_scale"):
+            def scale():
+                for cid, rec in list(board.placed.items()):
+                    if isinstance(rec, dict):
+                        rec["scale"] = rec["scale"] * 1.1
+                    else:  # v12 keeps slotted board_model records
+                        rec.scale *= 1.1
+                    board._apply_scale(cid, rec)
+                settle()
+            out["scale"] = _ms(scale)
+
+        inspector = mod.Inspector(root, board)
+        inspector.pack(side="left", fill="y")
+        root.update()
+        if "inspector" in benches:
+            out["inspector"] = _ms(lambda: (inspector.refresh(), root.update()))
+
+        if "drag" in benches:
+            cid = next(iter(board.placed))
+            x, y = (int(v) for v in board.coords(cid)[:2])
+
+            def drag():
+                # the second click is what starts a move in generations that select first
+                for _ in range(2):
+                    board.event_generate("<Button-1>", x=x, y=y)
+                    board.event_generate("<ButtonRelease-1>", x=x, y=y)
+                board.event_generate("<Button-1>", x=x, y=y)
+                for i in range(1, self.drag_steps + 1):
+                    board.event_generate("<Motion>", x=x + i % 40, y=y + i % 30, state=0x100)  # Button1 held
+                    root.update()
+                board.event_generate("<ButtonRelease-1>", x=x + 5, y=y + 5)
+                root.update()
+            out["drag"] = _ms(drag)
+        return out
+
+
+# ---------- Reporting ----------
+def _git_commit():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=here,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    key = lambda r: (r["app"], r["bench"])
+    before = {key(r): r for r in old["results"]}
+    print(f"{'app':24} {'bench':16} {'before':>10} {'after':>10} {'change':>8}")
+    for r in new["results"]:
+        b = before.get(key(r))
+        if b is None:
+            continue
+        ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+        print(f"{r['app']:24} {r['bench']:16} {b['median_ms']:10.1f} {r['median_ms']:10.1f} {ratio:7.2f}x")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--apps", nargs="+", default=GENERATIONS, choices=GENERATIONS)
+    ap.add_argument("--benches", nargs="+", default=BENCHES, choices=BENCHES)
+    ap.add_argument("--symbols", type=int, default=500, help="files in the synthetic folder")
+    ap.add_argument("--resolution", type=int, nargs=2, default=(512, 384), metavar=("W", "H"))
+    ap.add_argument("--items", type=int, default=200, help="symbols placed on the board")
+    ap.add_argument("--drag-steps", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--workdir", help="keep the synthetic folder here (default: a temp dir)")
+    ap.add_argument("--out", help="write JSON results here (default: stdout)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="print the change between two result files")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    work = args.workdir or tempfile.mkdtemp(prefix="symbol_bench_")
+    folder = make_symbol_folder(
+        os.path.join(work, f"symbols_{args.symbols}_{args.resolution[0]}x{args.resolution[1]}"),
+        args.symbols, tuple(args.resolution))
+    # every cache the apps keep goes to a scratch dir, so palette_load is genuinely cold
+    os.environ["SYMBOL_CACHE_DIR"] = os.path.join(work, "cache")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    xvfb = ensure_display()
+    try:
+        import PIL
+        import tkinter as tk
+        results = []
+        for app in args.apps:
+            timings = GenerationBench(app, folder, args.items, args.drag_steps, args.repeat).run(args.benches)
+            for bench in args.benches:
+                if bench in timings:
+                    results.append({"app": app, "bench": bench, **_summary(timings[bench])})
+            print(f"{app}: done", file=sys.stderr)
+        report = {
+            "schema": SCHEMA_VERSION,
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "tk": tk.TkVersion,
+            "platform": platform.platform(),
+            "params": {"symbols": args.symbols, "resolution": list(args.resolution), "items": args.items,
+                       "drag_steps": args.drag_steps, "repeat": args.repeat},
+            "results": results,
+        }
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+        if not args.workdir:
+            shutil.rmtree(work, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Tk-free board state: what is placed, where, at what scale and in which order.
+
+``BoardModel`` keeps one compact ``__slots__`` record per item, with ids that
+stay stable for the life of the board (Tk canvas ids belong to one canvas
+and one session). Positions are world coordinates, i.e. the board at zoom
+1.0, so zoom and scrolling are purely the view's business. ``BoardCanvas``
+in symbol_builder_v12 is one view of a model; scripts, batch exporters and
+tests can build and edit boards of any size without Tk.
+"""
+import json
+
+MODEL_VERSION = 1
+
+
+class ImageItem:
+    """A placed symbol image; ``src_size`` is its source size in pixels."""
+    __slots__ = ("id", "z", "x", "y", "scale", "name", "path", "src_size")
+    kind = "image"
+
+    def __init__(self, id, z, x, y, scale, name, path, src_size):
+        self.id, self.z, self.x, self.y, self.scale = id, z, x, y, scale
+        self.name, self.path, self.src_size = name, path, tuple(src_size)
+
+    def to_dict(self):
+        return {"kind": "image", "id": self.id, "z": self.z, "x": self.x, "y": self.y, "scale": self.scale,
+                "name": self.name, "path": self.path, "src_size": list(self.src_size)}
+
+
+class TextItem:
+    """A text box; its font size is ``font_size_base`` × ``scale`` (× the view's zoom)."""
+    __slots__ = ("id", "z", "x", "y", "scale", "name", "text", "font_family", "font_size_base")
+    kind = "text"
+
+    def __init__(self, id, z, x, y, scale, name, text, font_family, font_size_base):
+        self.id, self.z, self.x, self.y, self.scale = id, z, x, y, scale
+        self.name, self.text, self.font_family, self.font_size_base = name, text, font_family, font_size_base
+
+    def to_dict(self):
+        return {"kind": "text", "id": self.id, "z": self.z, "x": self.x, "y": self.y, "scale": self.scale,
+                "name": self.name, "text": self.text, "font_family": self.font_family,
+                "font_size_base": self.font_size_base}
+
+
+class LineItem:
+    """A polyline such as an ORBAT connector; ``points`` are (x0, y0, x1, y1, …) relative to (x, y)."""
+    __slots__ = ("id", "z", "x", "y", "scale", "name", "points")
+    kind = "line"
+
+    def __init__(self, id, z, x, y, scale, name, points):
+        self.id, self.z, self.x, self.y, self.scale = id, z, x, y, scale
+        self.name, self.points = name, tuple(points)
+
+    def to_dict(self):
+        return {"kind": "line", "id": self.id, "z": self.z, "x": self.x, "y": self.y, "scale": self.scale,
+                "name": self.name, "points": list(self.points)}
+
+
+ITEM_TYPES = {"image": ImageItem, "text": TextItem, "line": LineItem}
+
+
+class BoardModel:
+    """Items by id. Ids are never reused; higher ``z`` is drawn on top."""
+
+    def __init__(self):
+        self.items = {}    # id -> item, in insertion order
+        self._next_id = 1
+        self._top = 0      # highest z handed out so far
+        self._bottom = 0   # lowest
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items.values())
+
+    def __contains__(self, item_id):
+        return item_id in self.items
+
+    def __getitem__(self, item_id):
+        return self.items[item_id]
+
+    def get(self, item_id, default=None):
+        return self.items.get(item_id, default)
+
+    def _add(self, cls, x, y, scale, *fields):
+        self._top += 1
+        item = cls(self._next_id, self._top, x, y, scale, *fields)
+        self._next_id += 1
+        self.items[item.id] = item
+        return item
+
+    def add_image(self, name, path, src_size, x, y, scale=1.0):
+        return self._add(ImageItem, x, y, scale, name, path, src_size)
+
+    def add_text(self, name, x, y, text="UNIT", font_family="Segoe UI", font_size_base=18, scale=1.0):
+        return self._add(TextItem, x, y, scale, name, text, font_family, font_size_base)
+
+    def add_line(self, name, x, y, points, scale=1.0):
+        return self._add(LineItem, x, y, scale, name, points)
+
+    def remove(self, ids):
+        """Drop items; returns the ones that existed."""
+        return [it for it in (self.items.pop(i, None) for i in ids) if it is not None]
+
+    def clear(self):
+        self.items.clear()
+
+    def move(self, ids, dx, dy):
+        items = self.items
+        for i in ids:
+            it = items[i]
+            it.x += dx
+            it.y += dy
+
+    def raise_(self, ids):
+        """Bring items to the front, keeping their order among themselves."""
+        for it in sorted((self.items[i] for i in ids), key=lambda it: it.z):
+            self._top += 1
+            it.z = self._top
+
+    def lower(self, ids):
+        """Send items to the back, keeping their order among themselves."""
+        for it in sorted((self.items[i] for i in ids), key=lambda it: it.z, reverse=True):
+            self._bottom -= 1
+            it.z = self._bottom
+
+    def ordered(self):
+        """Items bottom → top."""
+        return sorted(self.items.values(), key=lambda it: it.z)
+
+    # ---- persistence ----
+    def to_dict(self):
+        return {"version": MODEL_VERSION, "items": [it.to_dict() for it in self.ordered()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"unsupported board version: {data.get('version')!r}")
+        model = cls()
+        for d in data["items"]:
+            d = dict(d)
+            item = ITEM_TYPES[d.pop("kind")](**d)
+            model.items[item.id] = item
+        if model.items:
+            model._next_id = max(model.items) + 1
+            zs = [it.z for it in model.items.values()]
+            model._top, model._bottom = max(zs), min(zs)
+        return model
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
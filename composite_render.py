@@ -0,0 +1,161 @@
+"""Headless rendering of placeholderapp's composite symbols.
+
+``placeholderapp.SymbolCanvas`` and ``CompositeRenderer`` share the frame
+and drop-zone geometry defined here, so a spec exported with
+``SymbolCanvas.to_json`` renders to the same picture without Tk:
+affiliation frame filled in the affiliation's colour, echelon/role/status/
+mobility/capability icons fitted into their zones (recoloured to sit on
+the fill where they fall inside the frame), and the unit name to the
+right. Output is cropped to the drawn content.
+"""
+import io
+import json
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+from symbol_images import content_bbox
+from symbol_index import SymbolIndex, load_manifest_names
+from symbol_pack import SymbolPack
+from symbol_recolor import VariantCache, fill_color
+
+CANVAS_SIZE = (900, 640)  # SymbolCanvas size in placeholderapp
+FRAME_SIZE = (520, 320)
+ZONE_HINTS = {"ECHELON": "Echelon", "ROLE": "Role (Branch)", "STATUS": "Status",
+              "MOBILITY": "Mobility", "CAPABILITY": "Capability"}
+SPEC_ZONES = {"echelon": "ECHELON", "role": "ROLE", "status": "STATUS",
+              "mobility": "MOBILITY", "capability": "CAPABILITY"}  # to_json key -> zone
+AFFILIATIONS = ("Friendly", "Hostile")
+FILLED_ZONES = {  # zones lying inside each frame shape, whose icons are drawn over the fill
+    "Friendly": ("ROLE", "STATUS", "MOBILITY", "CAPABILITY"),
+    "Hostile": ("ROLE",),
+}
+STATUS_BADGE = {"Reinforced (Attached)": "+", "Reduced (Detached)": "−", "Reinforced and Reduced": "±"}
+FONT_FILES = ("segoeuib.ttf", "arialbd.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf", "FreeSansBold.ttf")
+NAME_FONT_PX = 16   # Segoe UI 12 pt bold on the canvas
+CROP_MARGIN = 8
+ICON_CACHE_BYTES = 32 * 2**20
+
+
+def frame_box(size=CANVAS_SIZE):
+    cx, cy = size[0] // 2, size[1] // 2
+    fw, fh = FRAME_SIZE
+    return cx - fw // 2, cy - fh // 2, cx + fw // 2, cy + fh // 2
+
+
+def zone_boxes(frame):
+    """{zone: (x0, y0, x1, y1)} of the drop zones around and inside ``frame``."""
+    x0, y0, x1, y1 = frame
+    return {
+        "ECHELON": (x0 + 90, y0 - 48, x1 - 90, y0 - 8),
+        "ROLE": (x0 + 90, y0 + 50, x1 - 90, y1 - 50),
+        "STATUS": (x1 - 100, y0 + 8, x1 - 8, y0 + 60),
+        "MOBILITY": (x0 + 12, y1 - 60, x0 + 110, y1 - 12),
+        "CAPABILITY": (x1 - 110, y1 - 60, x1 - 12, y1 - 12),
+    }
+
+
+def fit_icon(path, w, h, pack=None):
+    """RGBA image of ``path`` scaled down to fit w × h (read from ``pack`` when it has it)."""
+    pyr = pack.pyramid(path) if pack is not None else None
+    if pyr is not None:
+        icon = pyr.level_for(w, h).copy()
+    else:
+        with Image.open(path) as im:
+            icon = im.convert("RGBA")
+    icon.thumbnail((w, h), Image.LANCZOS)
+    return icon
+
+
+def normalize_spec(spec):
+    """The spec with unknown keys dropped and values checked; raises ValueError."""
+    if not isinstance(spec, dict):
+        raise ValueError("spec must be a JSON object")
+    aff = spec.get("affiliation") or "Friendly"
+    if aff not in AFFILIATIONS:
+        raise ValueError(f"affiliation must be one of {', '.join(AFFILIATIONS)}")
+    out = {"affiliation": aff}
+    for key in list(SPEC_ZONES) + ["unit_name"]:
+        v = spec.get(key)
+        if v is not None and not isinstance(v, str):
+            raise ValueError(f"{key} must be a string or null")
+        out[key] = v or None
+    return out
+
+
+def spec_key(spec):
+    """Canonical text of a normalized spec, for caching."""
+    return json.dumps(spec, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _font(px):
+    for name in FONT_FILES:
+        try:
+            return ImageFont.truetype(name, px)
+        except OSError:
+            continue
+    return ImageFont.load_default(px)
+
+
+class CompositeRenderer:
+    """Renders specs against one symbol folder; keeps fitted icons in an LRU."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index = SymbolIndex.open(folder)
+        self.by_name = {name: path for path, name in load_manifest_names(folder).items()}
+        self._icons = VariantCache(ICON_CACHE_BYTES)  # (path, affiliation, w, h) -> fitted icon
+        self.pack = SymbolPack.find(folder)  # shared by every process rendering this folder
+        self._font = _font(NAME_FONT_PX)
+        self._badge_font = _font(NAME_FONT_PX + 8)
+
+    def resolve(self, name):
+        """Manifest names first (what placeholderapp exports), then the folder index."""
+        path = self.by_name.get(name)
+        return path if path and os.path.exists(path) else self.index.resolve(name)
+
+    def render(self, spec):
+        """RGB image of a normalized spec, cropped to what was drawn."""
+        im = Image.new("RGB", CANVAS_SIZE, "white")
+        draw = ImageDraw.Draw(im)
+        frame = frame_box()
+        x0, y0, x1, y1 = frame
+        aff = spec["affiliation"]
+        if aff == "Friendly":
+            draw.rectangle(frame, outline="black", width=3, fill=fill_color(aff))
+        else:
+            mx, my = (x0 + x1) // 2, (y0 + y1) // 2
+            draw.polygon([(mx, y0), (x1, my), (mx, y1), (x0, my)], outline="black", width=3, fill=fill_color(aff))
+
+        for key, zone in SPEC_ZONES.items():
+            name = spec.get(key)
+            if not name:
+                continue
+            zx0, zy0, zx1, zy1 = zone_boxes(frame)[zone]
+            cx, cy = (zx0 + zx1) // 2, (zy0 + zy1) // 2
+            path = self.resolve(name)
+            try:
+                # same fit as DropZone.set_value
+                w, h = max(24, zx1 - zx0 - 10), max(24, zy1 - zy0 - 10)
+                icon = self._icons.get(path, aff if zone in FILLED_ZONES[aff] else None, w, h,
+                                       lambda: fit_icon(path, w, h, self.pack))
+                im.paste(icon, (cx - icon.width // 2, cy - icon.height // 2), icon)
+            except Exception:
+                label = STATUS_BADGE.get(name, name) if zone == "STATUS" else name
+                font = self._badge_font if label in STATUS_BADGE.values() else self._font
+                draw.text((cx, cy), label, fill="black", font=font, anchor="mm")
+
+        if spec.get("unit_name"):
+            draw.text((x1 + 24, (y0 + y1) // 2), spec["unit_name"], fill="black", font=self._font, anchor="lm")
+
+        box = content_bbox(im.convert("RGBA"))
+        if box is None:
+            return im
+        l, t, r, b = box
+        return im.crop((max(0, l - CROP_MARGIN), max(0, t - CROP_MARGIN),
+                        min(im.width, r + CROP_MARGIN), min(im.height, b + CROP_MARGIN)))
+
+    def render_png(self, spec):
+        buf = io.BytesIO()
+        self.render(spec).save(buf, format="PNG", compress_level=3)
+        return buf.getvalue()
@@ -2,6 +2,8 @@ from PyPDF2 import PdfReader
 import fitz  # PyMuPDF for image extraction
 import os
 
+from symbol_ingest import trim_folder
+
 # Path to PDF
 pdf_path = "Finalized_Indian_army_Symbology_5.pdf"
 
@@ -31,4 +33,7 @@ for page_index in range(len(doc)):
         pix.save(image_path)
         image_files.append(image_path)
 
+# Crop the white/transparent margins once; offsets are kept in symbols_trim.json
+trim_folder(output_folder, [os.path.basename(p) for p in image_files])
+
 image_count, image_files[:10]  # show first 10 extracted paths
@@ -0,0 +1,260 @@
+"""Order-of-battle trees: parsing, tidy layout and conversion to board items.
+
+A hierarchy (army → corps → division → brigade → battalion …) is read from
+JSON (nested ``{"name", "echelon", "symbol", "children"}`` objects) or from an
+indented text outline, one unit per line::
+
+    I Corps (corps)
+      4 Infantry Division (division)
+        7 Brigade
+          1 Battalion
+
+An echelon left out is taken to be one step below the parent's. ``tidy_layout``
+is Buchheim, Jünger and Leipert's linear-time version of the Reingold–Tilford
+algorithm, run without recursion so deep outlines are fine too.
+``orbat_to_model`` then adds every symbol, label and elbow connector to a
+BoardModel in one pass; nothing here needs Tk.
+"""
+import json
+import os
+
+ECHELON_ORDER = ["army", "corps", "division", "brigade", "battalion", "company", "platoon",
+                 "section", "squad"]
+ECHELON_SYMBOLS = {  # echelon -> symbol name in the library (resolved through SymbolIndex.resolve)
+    "army": "Command Army",
+    "corps": "corps",
+    "division": "division",
+    "brigade": "brigade",
+    "regiment": "Regiment_battallion",
+    "battalion": "Regiment_battallion",
+    "company": "Company_battery_squadron",
+    "battery": "Company_battery_squadron",
+    "squadron": "Company_battery_squadron",
+    "section": "Section",
+    "squad": "Squad",
+}
+NODE_BOX = (120, 80)  # world units a unit symbol is fitted into
+NODE_GAP = 24         # between neighbouring subtrees
+LEVEL_GAP = 70        # between a unit's label and its subordinates' symbols
+LABEL_SIZE = 11       # label font size (points, before zoom)
+LABEL_SPACE = 22      # below the symbol box, taken by the label
+
+
+class OrbatNode:
+    """One unit; the remaining slots are scratch space for tidy_layout."""
+    __slots__ = ("name", "echelon", "symbol", "children", "parent", "number", "x", "y",
+                 "prelim", "mod", "shift", "change", "thread", "ancestor", "midpoint")
+
+    def __init__(self, name, echelon=None, symbol=None, children=None):
+        self.name, self.echelon, self.symbol = name, echelon, symbol
+        self.children = children if children is not None else []
+        self.parent = None
+        self.number = 0
+        self.x = self.y = 0.0
+
+    def __len__(self):
+        return sum(1 for _ in self.walk())
+
+    def walk(self):
+        """Every node, pre-order."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def _below(echelon):
+    if echelon in ECHELON_ORDER and echelon != ECHELON_ORDER[-1]:
+        return ECHELON_ORDER[ECHELON_ORDER.index(echelon) + 1]
+    return echelon
+
+
+def _link(root):
+    """Fill parent/number links and implied echelons."""
+    for node in root.walk():
+        for i, child in enumerate(node.children):
+            child.parent, child.number = node, i
+            if not child.echelon:
+                child.echelon = _below(node.echelon)
+    return root
+
+
+def orbat_from_dict(data):
+    root = None
+    stack = [(data, None)]
+    while stack:
+        d, parent = stack.pop()
+        node = OrbatNode(str(d["name"]), (d.get("echelon") or "").lower() or None, d.get("symbol"))
+        if parent is None:
+            root = node
+        else:
+            parent.children.append(node)
+        stack.extend((c, node) for c in reversed(d.get("children", [])))
+    return _link(root)
+
+
+def parse_outline(text):
+    """Tree from an indented outline; a trailing "(echelon)" is optional."""
+    roots, stack = [], []  # stack of (indent, node)
+    for line in text.splitlines():
+        body = line.strip()
+        if not body or body.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip())
+        echelon = None
+        if body.endswith(")") and "(" in body:
+            head, _, tail = body[:-1].rpartition("(")
+            if tail.strip().lower() in ECHELON_SYMBOLS or tail.strip().lower() in ECHELON_ORDER:
+                body, echelon = head.strip(), tail.strip().lower()
+        node = OrbatNode(body.lstrip("-* ").strip(), echelon)
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        if stack:
+            stack[-1][1].children.append(node)
+        else:
+            roots.append(node)
+        stack.append((indent, node))
+    if not roots:
+        raise ValueError("the outline has no units")
+    root = roots[0] if len(roots) == 1 else OrbatNode("ORBAT", None, None, roots)
+    return _link(root)
+
+
+def load_orbat(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() == ".json":
+        return orbat_from_dict(json.loads(text))
+    return parse_outline(text)
+
+
+# ---------- Tidy tree layout ----------
+def _next_left(v):
+    return v.children[0] if v.children else v.thread
+
+
+def _next_right(v):
+    return v.children[-1] if v.children else v.thread
+
+
+def _move_subtree(wl, wr, shift):
+    subtrees = wr.number - wl.number
+    wr.change -= shift / subtrees
+    wr.shift += shift
+    wl.change += shift / subtrees
+    wr.prelim += shift
+    wr.mod += shift
+
+
+def _apportion(v, default_ancestor, distance):
+    """Push v's subtree right until it clears every subtree to its left."""
+    if v.number == 0:
+        return default_ancestor
+    siblings = v.parent.children
+    vir = vor = v
+    vil = siblings[v.number - 1]
+    vol = siblings[0]
+    sir = sor = v.mod
+    sil, sol = vil.mod, vol.mod
+    while _next_right(vil) is not None and _next_left(vir) is not None:
+        vil, vir = _next_right(vil), _next_left(vir)
+        vol, vor = _next_left(vol), _next_right(vor)
+        vor.ancestor = v
+        shift = (vil.prelim + sil) - (vir.prelim + sir) + distance
+        if shift > 0:
+            anc = vil.ancestor if vil.ancestor.parent is v.parent else default_ancestor
+            _move_subtree(anc, v, shift)
+            sir += shift
+            sor += shift
+        sil += vil.mod
+        sir += vir.mod
+        sol += vol.mod
+        sor += vor.mod
+    if _next_right(vil) is not None and _next_right(vor) is None:
+        vor.thread = _next_right(vil)
+        vor.mod += sil - sor
+    elif _next_left(vir) is not None and _next_left(vol) is None:
+        vol.thread = _next_left(vir)
+        vol.mod += sir - sol
+        default_ancestor = v
+    return default_ancestor
+
+
+def _execute_shifts(v):
+    shift = change = 0.0
+    for w in reversed(v.children):
+        w.prelim += shift
+        w.mod += shift
+        change += w.change
+        shift += w.shift + change
+
+
+def tidy_layout(root, distance=NODE_BOX[0] + NODE_GAP, level=NODE_BOX[1] + LABEL_SPACE + LEVEL_GAP):
+    """Set ``x``/``y`` of every node (root at the top, leftmost unit at x = 0) in O(n).
+
+    Subtrees never overlap, parents sit centred over their children and
+    identical subtrees are drawn identically. Returns the nodes pre-order.
+    """
+    order = list(root.walk())
+    for v in order:
+        v.prelim = v.mod = v.shift = v.change = v.midpoint = 0.0
+        v.thread = None
+        v.ancestor = v
+    # first walk, post-order: a node's subtree is finished before its parent places it among its siblings
+    for v in reversed(order):
+        if v.children:
+            default_ancestor = v.children[0]
+            for w in v.children:
+                if w.number:
+                    w.prelim = v.children[w.number - 1].prelim + distance
+                    w.mod = w.prelim - w.midpoint
+                else:
+                    w.prelim = w.midpoint
+                default_ancestor = _apportion(w, default_ancestor, distance)
+            _execute_shifts(v)
+            v.midpoint = (v.children[0].prelim + v.children[-1].prelim) / 2
+    root.prelim = root.midpoint
+    # second walk, pre-order: add up the modifiers on the way down
+    stack = [(root, 0.0, 0)]
+    left = 0.0
+    while stack:
+        v, m, depth = stack.pop()
+        v.x, v.y = v.prelim + m, depth * level
+        left = min(left, v.x)
+        for w in v.children:
+            stack.append((w, m + v.mod, depth + 1))
+    for v in order:
+        v.x -= left
+        v.thread = v.ancestor = None  # drop the scratch links so the tree can be collected
+    return order
+
+
+# ---------- Board items ----------
+def orbat_to_model(model, root, symbol_for, origin=(0.0, 0.0)):
+    """Lay out ``root`` and add its symbols, labels and connectors to ``model``.
+
+    ``symbol_for(node)`` returns (path, (w, h)) of the node's symbol, or None
+    for a label-only node. ``origin`` is the world position of the tree's
+    top-left corner. Returns the new items in drawing order.
+    """
+    nodes = tidy_layout(root)
+    bw, bh = NODE_BOX
+    ox, oy = origin[0] + bw / 2, origin[1] + bh / 2
+    items = []
+    for node in nodes:
+        x, y = ox + node.x, oy + node.y
+        for child in node.children:  # elbow: label bottom → half-way → child's symbol top
+            cx, cy = ox + child.x - x, oy + child.y - y
+            top = cy - bh / 2
+            mid = top - LEVEL_GAP / 2
+            start = bh / 2 + LABEL_SPACE
+            items.append(model.add_line("Connector", x, y, (0, start, 0, mid, cx, mid, cx, top)))
+        sym = symbol_for(node)
+        if sym is not None:
+            path, (sw, sh) = sym
+            scale = min(1.0, bw / max(1, sw), bh / max(1, sh))
+            items.append(model.add_image(node.name, path, (sw, sh), x, y, scale))
+        items.append(model.add_text(node.name, x, y + bh / 2 + LABEL_SPACE / 2, text=node.name,
+                                    font_size_base=LABEL_SIZE))
+    return items
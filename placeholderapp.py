@@ -3,12 +3,14 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 
+from composite_render import FILLED_ZONES, STATUS_BADGE, ZONE_HINTS, fit_icon, frame_box, zone_boxes
+from symbol_index import SymbolSearchIndex, filename_to_name
+from symbol_recolor import VariantCache, fill_color
+
 # ---------------------- CONFIG ----------------------
 SYMS_DIR = os.path.abspath("./extracted_symbols")
 THUMB = (86, 86)
 
-STATUS_BADGE = {"Reinforced (Attached)": "+", "Reduced (Detached)": "−", "Reinforced and Reduced": "±"}
-
 # canvas zones size
 ZONE_FONT = ("Segoe UI", 12, "bold")
 
@@ -76,8 +78,7 @@ class DropZone:
         cx,cy = (x0+x1)//2,(y0+y1)//2
         # draw icon
         try:
-            img = Image.open(rec["path"]).convert("RGBA")
-            img.thumbnail((max(24,x1-x0-10), max(24,y1-y0-10)), Image.LANCZOS)
+            img = self.canvas.icon(rec["path"], max(24,x1-x0-10), max(24,y1-y0-10), self.name)
             tkimg = ImageTk.PhotoImage(img)
             self.img_id = self.canvas.create_image(cx, cy, image=tkimg)
             if not hasattr(self.canvas, "_imgrefs"): self.canvas._imgrefs = {}
@@ -97,24 +98,25 @@ class DropZone:
 class SymbolCanvas(tk.Canvas):
     def __init__(self, master, **kw):
         super().__init__(master, bg="white", **kw)
-        self.affiliation = "Friendly"  # Friendly/Hostile (frame shape)
+        self.affiliation = "Friendly"  # Friendly/Hostile (frame shape and fill colour)
         self._imgrefs = {}
+        self.variants = VariantCache()  # fitted zone icons per (path, affiliation, size)
         self._build()
 
     def _build(self):
         W,H = int(self["width"]), int(self["height"])
-        cx,cy = W//2, H//2
-        fw,fh = 520, 320
-        self.frame_box = (cx-fw//2, cy-fh//2, cx+fw//2, cy+fh//2)
+        self.frame_box = frame_box((W, H))
         self._draw_frame()
 
         x0,y0,x1,y1 = self.frame_box
-        # zones
-        self.z_ech = DropZone(self, "ECHELON", {"ECHELON"}, (x0+90, y0-48, x1-90, y0-8), "Echelon")
-        self.z_role = DropZone(self, "ROLE", {"ROLE"}, (x0+90, y0+50, x1-90, y1-50), "Role (Branch)")
-        self.z_status = DropZone(self, "STATUS", {"STATUS"}, (x1-100, y0+8, x1-8, y0+60), "Status")
-        self.z_mob = DropZone(self, "MOBILITY", {"MOBILITY"}, (x0+12, y1-60, x0+110, y1-12), "Mobility")
-        self.z_cap = DropZone(self, "CAPABILITY", {"CAPABILITY"}, (x1-110, y1-60, x1-12, y1-12), "Capability")
+        # zones (geometry shared with the headless renderer in composite_render)
+        boxes = zone_boxes(self.frame_box)
+        zone = lambda name: DropZone(self, name, {name}, boxes[name], ZONE_HINTS[name])
+        self.z_ech = zone("ECHELON")
+        self.z_role = zone("ROLE")
+        self.z_status = zone("STATUS")
+        self.z_mob = zone("MOBILITY")
+        self.z_cap = zone("CAPABILITY")
 
         # unit name (right of frame)
         self.unit_text = self.create_text(x1+24, (y0+y1)//2, text="", anchor="w", font=("Segoe UI", 12, "bold"))
@@ -122,15 +124,25 @@ class SymbolCanvas(tk.Canvas):
     def _draw_frame(self):
         self.delete("FRAME")
         x0,y0,x1,y1 = self.frame_box
+        fill = fill_color(self.affiliation)
         if self.affiliation == "Friendly":
-            self.create_rectangle(x0,y0,x1,y1, width=3, tags="FRAME")
+            self.create_rectangle(x0,y0,x1,y1, width=3, fill=fill, tags="FRAME")
         else:
             mx,my = (x0+x1)//2,(y0+y1)//2
-            self.create_polygon(mx,y0, x1,my, mx,y1, x0,my, outline="black", width=3, fill="", tags="FRAME")
+            self.create_polygon(mx,y0, x1,my, mx,y1, x0,my, outline="black", width=3, fill=fill, tags="FRAME")
+        self.tag_lower("FRAME")  # the fill goes under the zones and their icons
+
+    def icon(self, path, w, h, zone):
+        """Icon fitted to w × h; recoloured for the affiliation where the zone sits on the frame fill."""
+        aff = self.affiliation if zone in FILLED_ZONES[self.affiliation] else None
+        return self.variants.get(path, aff, w, h, lambda: fit_icon(path, w, h))
 
     def set_affiliation(self, aff):
         self.affiliation = aff
         self._draw_frame()
+        for z in (self.z_ech, self.z_role, self.z_status, self.z_mob, self.z_cap):
+            if z.assignment:
+                z.set_value(z.assignment)  # redraw icons in the new colours
         self.event_generate("<<Changed>>")
 
     def set_unit_name(self, s):
@@ -229,6 +241,11 @@ class Palette(ttk.Frame):
         self.on_hover = on_hover
 
         ttk.Label(self, text="Palette", font=("Segoe UI",12,"bold")).pack(anchor="w", padx=8, pady=(8,4))
+        self.search_var = tk.StringVar()
+        ent = ttk.Entry(self, textvariable=self.search_var); ent.pack(fill="x", padx=8)
+        ent.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_var.trace_add("write", lambda *_: self._populate())
+        self._search = None  # (lib, SymbolSearchIndex), rebuilt when the library is swapped
         self.nb = ttk.Notebook(self); self.nb.pack(fill="both", expand=True, padx=6, pady=6)
 
         self.tabs = {}
@@ -259,10 +276,25 @@ class Palette(ttk.Frame):
                 w.bind("<Button-1>", lambda e, rec=it: self._start_drag(e, rec))
         for c in range(3): frm.grid_columnconfigure(c, weight=1)
 
+    def _search_index(self):
+        if self._search is None or self._search[0] is not self.lib:
+            idx = SymbolSearchIndex()
+            for i, it in enumerate(self.lib.items):
+                idx.add(i, it["name"], filename_to_name(it["path"]))
+            self._search = (self.lib, idx)
+        return self._search[1]
+
     def _populate(self):
+        query = self.search_var.get().strip()
+        rank = None
+        if query:
+            rank = {id(self.lib.items[i]): r for r, i in enumerate(self._search_index().search(query))}
         for key, frame in self.tabs.items():
             for w in frame.winfo_children(): w.destroy()
-            self._grid(frame, self.lib.by_type.get(key, []))
+            items = self.lib.by_type.get(key, [])
+            if rank is not None:
+                items = sorted((it for it in items if id(it) in rank), key=lambda it: rank[id(it)])
+            self._grid(frame, items)
 
     def _start_drag(self, event, rec):
         ghost = DragGhost(self.winfo_toplevel(), img=rec["thumb"])
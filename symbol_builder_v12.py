@@ -1,10 +1,33 @@
+import time
+_STARTED = time.perf_counter()  # startup breakdown is measured from here
+
 import os
 import re
-import glob
-import shutil
+import sys
+import bisect
+import weakref
+import functools
+import math
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import Image, ImageTk
+
+from board_model import BoardModel
+from board_snap import GRID_SIZE, SNAP_DISTANCE, EdgeIndex, snap_box
+from orbat_layout import ECHELON_SYMBOLS, load_orbat, orbat_to_model
+from symbol_images import CACHE_DIR, SymbolImageCache, ThumbnailAtlas, make_thumbnail, save_trim_info
+from symbol_ingest import IngestJob
+from symbol_pack import SymbolPack
+from symbol_index import (ALLOWED_EXTS, SymbolIndex, SymbolSearchIndex, filename_to_name,
+                          load_manifest_names, natural_key)
+from unit_import import add_units, read_units
+from symbol_perf import (PERF_ENABLED, PROFILE_KINDS, PerfOverlay, PerfRecorder, ProfileSession,
+                         StartupTimer, default_dump_path, parse_profile_kinds)
+# symbol_similarity (NumPy), symbol_shared and ImageDraw/ImageFont are imported where first used
 
 # ---------- Default symbols dir resolver ----------
 def compute_default_symbols_dir():
@@ -22,100 +45,133 @@ def compute_default_symbols_dir():
     os.makedirs(path, exist_ok=True)
     return path
 
-DEFAULT_SYMBOLS_DIR = compute_default_symbols_dir()
-
 PALETTE_WIDTH = 340
 RIGHT_PANEL_WIDTH = 380
 CANVAS_SIZE = (1100, 720)
+BOARD_SIZE = (CANVAS_SIZE[0] * 8, CANVAS_SIZE[1] * 8)  # initial world size at zoom 1.0; grows to fit content
+BOARD_PAD = 200     # world units kept free beyond the furthest item when the board grows
+ZOOM_MIN, ZOOM_MAX, ZOOM_STEP = 0.1, 4.0, 1.25
+GRID_MIN_PX = 8     # grid lines closer than this on screen are thinned out
+SNAP_MARGIN = 1.0   # items within this many viewports of the visible area act as guides
+ALT_MASK = 0x20000 if sys.platform == "win32" else 0x0008  # event.state bit for Alt
+VIEW_MARGIN = 0.5   # rasterize items within half a viewport of the visible area
+EVICT_MARGIN = 2.0  # release bitmaps for items more than two viewports away
+HIT_SLOP = 2        # screen pixels around a click that still count as on a symbol
+PHOTO_PIXEL_BUDGET = int(os.getenv("PHOTO_PIXEL_BUDGET", 48_000_000))  # live PhotoImage pixels
+RESAMPLE_WORKERS = os.cpu_count() or 2  # LANCZOS releases the GIL, so resizes run truly in parallel
+RESAMPLE_POLL_MS = 15                   # how often finished resamples are collected (about a frame)
 THUMB_SIZE = (96, 96)
+ROW_HEIGHT = THUMB_SIZE[1] + 12  # palette row pitch
+THUMB_CACHE_SIZE = 256           # per-file palette thumbnails kept when the atlas is off
+USE_THUMB_ATLAS = os.getenv("PALETTE_ATLAS", "1") != "0"
+AFFILIATIONS = ("Friendly", "Hostile", "Neutral", "Unknown")  # keys of symbol_recolor.AFFILIATION_PALETTES
+AS_DRAWN = "As drawn"
+SHARED_IMAGES = os.getenv("SHARED_IMAGES", "0") == "1"  # share decoded symbols with other running instances
+ATLAS_POLL_MS = 100              # how often the palette checks on a background atlas build
+WATCH_INTERVAL_MS = 2000         # symbol folder polling period
+CHECK_DUPLICATES_ON_UPLOAD = os.getenv("CHECK_DUPLICATES", "1") != "0"
+NORMALIZE_UPLOADS = os.getenv("NORMALIZE_UPLOADS", "0") == "1"  # trim, RGBA PNG, capped size
+INGEST_POLL_MS = 50              # how often the UI collects finished uploads
 BG = "#f6f7fb"
-ALLOWED_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
 
 SPECIAL_TEXT_TOKEN = "::TEXT_UNIT_CODE::"
+STARTUP_TIMES = "--startup-times" in sys.argv or os.getenv("SYMBOL_STARTUP_TIMES", "0") == "1"
 
 # ---------- Helpers ----------
-def natural_key(s: str):
-    return [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", s)]
-
-def filename_to_name(path: str) -> str:
-    base = os.path.splitext(os.path.basename(path))[0]
-    return re.sub(r"[_\-]+", " ", base).strip()
-
-def list_symbol_files(folder: str):
-    files = []
-    for ext in ALLOWED_EXTS:
-        files.extend(glob.glob(os.path.join(folder, f"*{ext}")))
-    return sorted(files, key=natural_key)
-
-def safe_copy_to_folder(src_path: str, dest_folder: str) -> str:
-    os.makedirs(dest_folder, exist_ok=True)
-    name, ext = os.path.splitext(os.path.basename(src_path))
-    ext = ext.lower()
-    base = re.sub(r"[^\w\-]+", "_", name).strip("_") or "symbol"
-    candidate = os.path.join(dest_folder, base + ext)
-    i = 1
-    while os.path.exists(candidate):
-        candidate = os.path.join(dest_folder, f"{base}_{i}{ext}")
-        i += 1
-    shutil.copy2(src_path, candidate)
-    return candidate
+PIL_FONT_CANDIDATES = ("arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf", "FreeSans.ttf")
 
+@functools.lru_cache(maxsize=None)
+def _pil_font_file():
+    """First of PIL_FONT_CANDIDATES that loads, or None; the font path scan happens once."""
+    from PIL import ImageFont
+    for name in PIL_FONT_CANDIDATES:
+        try:
+            ImageFont.truetype(name, size=12)
+            return name
+        except OSError:
+            continue
+    return None
+
+@functools.lru_cache(maxsize=32)
+def pil_font(size: int):
+    from PIL import ImageFont
+    name = _pil_font_file()
+    return ImageFont.truetype(name, size=size) if name else ImageFont.load_default()
+
+@functools.lru_cache(maxsize=8)
 def make_text_tool_icon(size=(THUMB_SIZE[0], THUMB_SIZE[1])) -> Image.Image:
+    """Text-tool icon, rendered once per size; callers must not modify it."""
+    from PIL import ImageDraw  # only needed once the window is up
     w, h = size
     im = Image.new("RGBA", (w, h), (245, 246, 250, 255))
     draw = ImageDraw.Draw(im)
     # rounded border
     draw.rounded_rectangle([(2, 2), (w-3, h-3)], radius=12, outline=(70, 120, 200, 255), width=2)
     # big 'Aa'
-    try:
-        # Try a nicer font if available; otherwise default
-        font = ImageFont.truetype("arial.ttf", size=int(h*0.44))
-    except Exception:
-        font = ImageFont.load_default()
+    font = pil_font(int(h*0.44))
     text = "Aa"
     tw, th = draw.textbbox((0, 0), text, font=font)[2:]
     draw.text(((w - tw)//2, (h - th)//2), text, fill=(20, 20, 20, 255), font=font)
     return im
 
 # ---------- Palette ----------
+class _PaletteSlot:
+    """One reusable palette row; shows whichever entry it is currently bound to."""
+
+    def __init__(self, palette):
+        self.frame = ttk.Frame(palette.canvas)
+        self.thumb = tk.Canvas(self.frame, width=THUMB_SIZE[0], height=THUMB_SIZE[1],
+                               bg=BG, highlightthickness=0)
+        self.thumb.grid(row=0, column=0, rowspan=2, sticky="w")
+        self.img = self.thumb.create_image(0, 0, anchor="nw")
+        self.label = ttk.Label(self.frame, wraplength=PALETTE_WIDTH-140, justify="left")
+        self.label.grid(row=0, column=1, sticky="w", padx=(10, 0))
+        self.window = palette.canvas.create_window(10, 0, window=self.frame, anchor="nw",
+                                                   width=PALETTE_WIDTH-20, state="hidden")
+        self.index = None
+        self.path = None
+        for w in (self.thumb, self.label):
+            w.bind("<Button-1>", lambda ev: palette._begin_slot(self, ev))
+            w.bind("<Button-3>", lambda ev: palette._slot_menu(self, ev))
+            palette._bind_wheel(w)
+
+
 class SymbolPalette(ttk.Frame):
-    def __init__(self, master, on_start_drag, **kw):
+    """Scrollable symbol list that only builds widgets for the rows in view.
+
+    A small pool of row slots is rebound as the list scrolls, so the widget
+    count stays constant however large the folder is. With ``use_atlas`` the
+    thumbnails come from a cached ThumbnailAtlas and every slot shows a cell
+    of one shared page image; otherwise per-file thumbnails are made on
+    demand for the visible rows and kept in a small LRU. A folder with an
+    up-to-date symbol pack skips the atlas: its thumbnails are already in
+    memory.
+    """
+
+    def __init__(self, master, on_start_drag, use_atlas=USE_THUMB_ATLAS, on_find_similar=None, **kw):
         super().__init__(master, **kw)
         self.on_start_drag = on_start_drag
-        self.canvas = tk.Canvas(self, width=PALETTE_WIDTH, bg=BG, highlightthickness=0)
-        self.sb = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.inner = ttk.Frame(self.canvas)
-        self.inner.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.inner, anchor="nw", width=PALETTE_WIDTH)
-        self.canvas.configure(yscrollcommand=self.sb.set)
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.sb.pack(side="right", fill="y")
-        self._imgrefs = {}
-        self.folder = None
-        self.files = []
-
-    def load_folder(self, folder: str):
-        self.folder = folder
-        self.files = list_symbol_files(folder)
-
-        for w in self.inner.winfo_children():
-            w.destroy()
-
-        title = ttk.Label(self.inner, text=f"Palette ({len(self.files)} symbols)", font=("Segoe UI", 12, "bold"))
-        title.pack(anchor="w", padx=12, pady=(10, 6))
-        ttk.Separator(self.inner).pack(fill="x", padx=12, pady=(0, 8))
-
-        # ---- Synthetic "Text Box" tool at the top ----
-        text_row = ttk.Frame(self.inner)
+        self.on_find_similar = on_find_similar
+        self.use_atlas = use_atlas
+
+        # ---- header: title + synthetic "Text Box" tool (not scrolled) ----
+        header = ttk.Frame(self)
+        header.pack(side="top", fill="x")
+        self.title = ttk.Label(header, text="Palette (0 symbols)", font=("Segoe UI", 12, "bold"))
+        self.title.pack(anchor="w", padx=12, pady=(10, 6))
+        self.search_var = tk.StringVar()
+        search = ttk.Entry(header, textvariable=self.search_var)
+        search.pack(fill="x", padx=12, pady=(0, 8))
+        search.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_var.trace_add("write", lambda *_: self._apply_filter())
+        ttk.Separator(header).pack(fill="x", padx=12, pady=(0, 8))
+
+        text_row = ttk.Frame(header)
         text_row.pack(fill="x", padx=10, pady=6)
-
-        text_icon = make_text_tool_icon()
-        tk_text_icon = ImageTk.PhotoImage(text_icon)
-        self._imgrefs["__text_tool__"] = tk_text_icon
-
-        lbl_img = ttk.Label(text_row, image=tk_text_icon)
+        # blank until load_text_icon(): the font lookup waits until after first paint
+        self._text_icon = tk.PhotoImage(width=THUMB_SIZE[0], height=THUMB_SIZE[1])
+        self._text_icon_lbl = lbl_img = ttk.Label(text_row, image=self._text_icon)
         lbl_img.grid(row=0, column=0, rowspan=2, sticky="w")
-
         lbl_txt = ttk.Label(text_row, text="Text Box (Unit Code)", wraplength=PALETTE_WIDTH-140, justify="left")
         lbl_txt.grid(row=0, column=1, sticky="w", padx=(10, 0))
 
@@ -124,55 +180,548 @@ class SymbolPalette(ttk.Frame):
 
         lbl_img.bind("<Button-1>", begin_text)
         lbl_txt.bind("<Button-1>", begin_text)
+        ttk.Separator(header).pack(fill="x", padx=12, pady=(6, 10))
 
-        ttk.Separator(self.inner).pack(fill="x", padx=12, pady=(6, 10))
+        # ---- virtualized rows ----
+        self.canvas = tk.Canvas(self, width=PALETTE_WIDTH, bg=BG, highlightthickness=0,
+                                yscrollincrement=ROW_HEIGHT)
+        self.sb = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.sb.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", lambda e: self._layout())
+        self._bind_wheel(self.canvas)
+        self._empty = self.canvas.create_text(
+            12, 8, anchor="nw", fill="#666", state="hidden",
+            text="No images found.\nAdd PNG/JPG symbols to the folder.")
+
+        self._slots = []
+        self._imgrefs = OrderedDict()  # path -> PhotoImage, only used without the atlas
+        self._fresh = OrderedDict()    # path -> PIL thumbnail handed over by an upload
+        self._atlas = None
+        self._atlas_pages = []         # one PhotoImage per atlas page
+        self._atlas_job = None         # Future of an atlas being built in the background
+        self._atlas_src = None         # (folder, files) that job is building
+        self._atlas_pool = None
+        self._stale = set()            # paths whose atlas cell predates a change on disk
+        self.symbol_pack = None        # the folder's SymbolPack, if it has one
+        self._search = None            # SymbolSearchIndex, built on the first query
+        self._manifest = {}            # path -> manifest name, searched alongside labels
+        self.folder = None
+        self.files = []
+        self.rows = []                 # entries currently listed
 
-        # ---- Real image symbols from folder ----
-        if not self.files:
-            ttk.Label(self.inner, text="No images found.\nAdd PNG/JPG symbols to the folder.",
-                      foreground="#666").pack(anchor="w", padx=12, pady=8)
-            return
+    def load_text_icon(self):
+        self._text_icon = ImageTk.PhotoImage(make_text_tool_icon())
+        self._text_icon_lbl.configure(image=self._text_icon)
 
-        for idx, path in enumerate(self.files, 1):
-            row = ttk.Frame(self.inner)
-            row.pack(fill="x", padx=10, pady=6)
+    def load_folder(self, folder: str, index=None):
+        """Show ``folder``; pass its SymbolIndex to reuse an existing listing."""
+        index = index or SymbolIndex.open(folder)
+        self.folder = folder
+        self.files = index.paths
+        self._imgrefs.clear()
+        self._fresh.clear()
+        self._stale.clear()
+        self._search = None
+        self._manifest = load_manifest_names(folder)
+        job, self._atlas_job = self._atlas_job, None
+        self._atlas, self._atlas_pages = None, []
+        if self.symbol_pack is not None:
+            self.symbol_pack.close()  # unmapped now, or with the last image still using it
+        self.symbol_pack = SymbolPack.find(folder)
+        # an up-to-date pack hands out thumbnails straight from memory, so no atlas is needed
+        packed = self.symbol_pack is not None and all(self.symbol_pack.entry(p, index.stat(p)) for p in self.files)
+        if self.use_atlas and self.files and not packed:
+            atlas = ThumbnailAtlas.load_cached(folder, self.files, THUMB_SIZE, stats=index.stat)
+            if atlas is not None:
+                self._set_atlas(atlas)
+            elif job is not None and self._atlas_src == (folder, self.files):
+                self._atlas_job = job  # the same listing is already being built: keep waiting on it
+            else:
+                # cold cache: visible rows decode their own thumbnails until the atlas is ready
+                self._build_atlas(folder, index)
+        if job is not None and job is not self._atlas_job:
+            job.cancel()  # superseded; a build that has already started runs out unpolled
+        self._apply_filter()
+
+    def _build_atlas(self, folder, index):
+        if self._atlas_pool is None:
+            self._atlas_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="atlas")
+        files = list(self.files)
+        sigs = {p: index.stat(p) for p in files}  # snapshot: the index keeps changing on this thread
+        job = self._atlas_pool.submit(ThumbnailAtlas.load_or_build, folder, files, THUMB_SIZE, stats=sigs.get)
+        self._atlas_job = job
+        self._atlas_src = (folder, files)
+        self.after(ATLAS_POLL_MS, self._poll_atlas, job)
+
+    def _poll_atlas(self, job):
+        if job is not self._atlas_job:
+            return  # another folder was loaded meanwhile
+        if not job.done():
+            self.after(ATLAS_POLL_MS, self._poll_atlas, job)
+            return
+        self._atlas_job = None
+        try:
+            atlas = job.result()
+        except Exception:
+            return  # per-file thumbnails keep working
+        self._set_atlas(atlas)
+        self._imgrefs.clear()
+        for slot in self._slots:
+            slot.index = None  # rebind visible rows onto the atlas
+        self._layout()
+
+    def _set_atlas(self, atlas):
+        self._atlas = atlas
+        self._atlas_pages = [ImageTk.PhotoImage(page) for page in atlas.pages]
+
+    def apply_changes(self, added=(), removed=(), changed=()):
+        """Patch the listing in place instead of reloading the whole folder.
+
+        Only slots currently in view are re-rendered, so adding one file to a
+        large folder costs a handful of row updates.
+        """
+        if removed:
+            gone = set(removed)
+            self.files = [p for p in self.files if p not in gone]
+            for p in gone:
+                self._imgrefs.pop(p, None)
+                if self._search is not None:
+                    self._search.remove(p)
+        for p in changed:
+            self._imgrefs.pop(p, None)
+            self._stale.add(p)
+        if added:
+            known = set(self.files)
+            for p in added:
+                if p not in known:
+                    bisect.insort(self.files, p, key=natural_key)
+                    if self._search is not None:
+                        self._search.add(p, filename_to_name(p), self._manifest.get(p))
+        touched = set(changed)
+        for slot in self._slots:
+            if slot.path in touched:
+                slot.index = None
+        self._apply_filter(keep_scroll=True)
+
+    def _search_index(self):
+        if self._search is None:
+            self._search = SymbolSearchIndex()
+            for p in self.files:
+                self._search.add(p, filename_to_name(p), self._manifest.get(p))
+        return self._search
+
+    def _apply_filter(self, keep_scroll=False):
+        """List the files matching the search box (all of them when it's empty)."""
+        query = self.search_var.get().strip()
+        if query:
+            rows = self._search_index().search(query)
+            self.title.configure(text=f"Palette ({len(rows)} of {len(self.files)} symbols)")
+            self.canvas.itemconfigure(self._empty, text=f"No symbols match “{query}”.")
+        else:
+            rows = self.files
+            self.title.configure(text=f"Palette ({len(self.files)} symbols)")
+            self.canvas.itemconfigure(self._empty, text="No images found.\nAdd PNG/JPG symbols to the folder.")
+        self._set_rows(rows, keep_scroll=keep_scroll)
+
+    def _set_rows(self, paths, keep_scroll=False):
+        self.rows = paths
+        if not keep_scroll:
+            for slot in self._slots:
+                slot.index = None  # force a rebind
+        self.canvas.itemconfigure(self._empty, state="hidden" if paths else "normal")
+        self.canvas.configure(scrollregion=(0, 0, PALETTE_WIDTH, max(1, len(paths)) * ROW_HEIGHT))
+        if not keep_scroll:
+            self.canvas.yview_moveto(0)
+        self._layout()
+
+    def _on_yscroll(self, first, last):
+        self.sb.set(first, last)
+        self._layout()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        widget.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        widget.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+
+    def _layout(self):
+        """Bind the slot pool to the rows currently in view."""
+        first = max(0, int(self.canvas.canvasy(0)) // ROW_HEIGHT)
+        need = max(self.canvas.winfo_height(), ROW_HEIGHT) // ROW_HEIGHT + 2
+        while len(self._slots) < need:
+            self._slots.append(_PaletteSlot(self))
+        for k, slot in enumerate(self._slots):
+            idx = first + k
+            if k < need and idx < len(self.rows):
+                if slot.index != idx or slot.path != self.rows[idx]:
+                    self._bind_slot(slot, idx)
+                self.canvas.itemconfigure(slot.window, state="normal")
+            elif slot.index is not None:
+                slot.index = slot.path = None
+                self.canvas.itemconfigure(slot.window, state="hidden")
+
+    def _bind_slot(self, slot, idx):
+        path = self.rows[idx]
+        slot.index, slot.path = idx, path
+        self.canvas.coords(slot.window, 10, idx * ROW_HEIGHT + 6)
+        slot.label.configure(text=f"{idx + 1}. {filename_to_name(path)}")
+        tkimg, x, y = self._thumb_for(path)
+        slot.thumb.itemconfigure(slot.img, image=tkimg)
+        slot.thumb.coords(slot.img, x, y)
+
+    def prime_thumbnails(self, thumbs):
+        """Keep thumbnails already made elsewhere ({path: PIL image}) so rows skip the decode."""
+        for path, im in thumbs.items():
+            self._fresh[path] = im
+            self._fresh.move_to_end(path)
+        while len(self._fresh) > THUMB_CACHE_SIZE:
+            self._fresh.popitem(last=False)
+
+    def _thumb_for(self, path):
+        """(image, x, y) to show in a slot's thumbnail viewport."""
+        if self._atlas is not None and path in self._atlas and path not in self._stale:
+            page, x, y = self._atlas.cells[path]
+            return self._atlas_pages[page], -x, -y
+        tkimg = self._imgrefs.get(path)
+        if tkimg is None:
+            thumb = (self._fresh.pop(path, None)
+                     or (self.symbol_pack.thumbnail(path, THUMB_SIZE) if self.symbol_pack is not None else None)
+                     or make_thumbnail(path, THUMB_SIZE))
+            tkimg = ImageTk.PhotoImage(thumb)
+            self._imgrefs[path] = tkimg
+            while len(self._imgrefs) > THUMB_CACHE_SIZE:
+                self._imgrefs.popitem(last=False)
+        else:
+            self._imgrefs.move_to_end(path)
+        return tkimg, (THUMB_SIZE[0] - tkimg.width()) // 2, (THUMB_SIZE[1] - tkimg.height()) // 2
 
-            lbl_img = ttk.Label(row)
-            lbl_img.grid(row=0, column=0, rowspan=2, sticky="w")
+    def _begin_slot(self, slot, ev):
+        if slot.path:
+            self.on_start_drag(filename_to_name(slot.path), slot.path, ev)
 
+    def _slot_menu(self, slot, ev):
+        if not slot.path or self.on_find_similar is None:
+            return
+        menu = tk.Menu(self, tearoff=0)
+        menu.add_command(label="Find Similar", command=lambda p=slot.path: self.on_find_similar(p))
+        try:
+            menu.tk_popup(ev.x_root, ev.y_root)
+        finally:
+            menu.grab_release()
+
+    def show_results(self, paths, caption):
+        """List ``paths`` (e.g. similarity hits) until the search box is edited."""
+        self.title.configure(text=caption)
+        self.canvas.itemconfigure(self._empty, text="Nothing to show.")
+        self._set_rows([p for p in paths if os.path.exists(p)])
+
+# ---------- Viewport culling ----------
+class ViewportManager:
+    """Keeps PhotoImages only for board items in or near the viewport.
+
+    Released items show one shared 1×1 placeholder. That holds no real pixels
+    but keeps the item findable through ``find_overlapping``, so the canvas
+    itself answers "what is near the scrollregion window?". Bitmaps are rebuilt
+    from the board's decoded-image cache when an item comes back into range.
+
+    Decoding and resampling run on a worker pool. Every request bumps the
+    item's generation; a result is installed only for waiters whose
+    generation is still current, so superseded scales are dropped (or
+    cancelled before they start). Meanwhile an item keeps its previous
+    bitmap, or gets a nearest-neighbour preview when its source is decoded.
+    """
+
+    def __init__(self, board, pixel_budget=PHOTO_PIXEL_BUDGET,
+                 keep_margin=VIEW_MARGIN, evict_margin=EVICT_MARGIN):
+        self.board = board
+        self.pixel_budget = pixel_budget
+        self.keep_margin = keep_margin    # rasterize items within this many viewports
+        self.evict_margin = evict_margin  # release items beyond this many viewports
+        self.placeholder = tk.PhotoImage(master=board, width=1, height=1)
+        self._bitmaps = weakref.WeakValueDictionary()  # (path, w, h, affiliation) -> PhotoImage shared by items
+        self._refs = {}       # (path, w, h, affiliation) -> number of live items showing it
+        self.live = {}        # cid -> (path, w, h, affiliation)
+        self._held = {}       # cid -> its PhotoImage (the strong refs behind _bitmaps)
+        self.pixels = 0       # pixels held by distinct live bitmaps
+        self._max_half = 0.0  # largest item half-extent seen, in world units
+        self._gen = {}        # cid -> generation of its latest request
+        self.pending = {}     # cid -> (generation, key) it is waiting for
+        self._jobs = {}       # key -> (Future, [(cid, generation), ...]) one resample per key
+        self._previews = {}   # cid -> nearest-neighbour stand-in shown while waiting
+        self._done = queue.SimpleQueue()  # (key, Future) from worker threads
+        self._pool = None
+        self._poll_job = None
+        self._tight_zoom = None  # zoom at which the budget stopped covering the keep margin
+
+    def rasterize(self, cid):
+        """Give an image item a bitmap at its current on-screen size.
+
+        Reuses a shared bitmap at once when one exists; otherwise queues a
+        resample and returns immediately.
+        """
+        board = self.board
+        rec = board.placed[cid]
+        w, h = board._display_size(rec)
+        key = (rec.path, w, h, board.affiliation)
+        self._max_half = max(self._max_half, max(rec.src_size) * rec.scale / 2)
+        if self.live.get(cid) == key and cid not in self.pending:
+            return
+        tkimg = self._bitmaps.get(key)
+        if tkimg is not None:
+            self._cancel(cid)
+            self._install(cid, key, tkimg)
+            return
+        if self.pending.get(cid, (0, None))[1] == key:
+            return  # already on its way
+        self._cancel(cid)
+        gen = self._gen[cid] = self._gen.get(cid, 0) + 1
+        self.pending[cid] = (gen, key)
+        job = self._jobs.get(key)
+        if job is None:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=RESAMPLE_WORKERS, thread_name_prefix="resample")
+            fut = self._pool.submit(self._resample, *key, rec.src_size)
+            job = self._jobs[key] = (fut, [])
+            fut.add_done_callback(lambda f, key=key: self._done.put((key, f)))
+        job[1].append((cid, gen))
+        if cid not in self.live and rec.path in board.images:
+            # nothing on screen yet but the source is decoded: a cheap stand-in until LANCZOS lands
+            preview = ImageTk.PhotoImage(board.images.get(rec.path).render(w, h, Image.NEAREST))
+            self._previews[cid] = preview
+            board.itemconfig(cid, image=preview)
+        if self._poll_job is None:
+            self._poll_job = board.after(RESAMPLE_POLL_MS, self._collect)
+
+    def _resample(self, path, w, h, affiliation, src_size):
+        """Worker side: decode (through the shared cache), resample and recolour."""
+        images, variants = self.board.images, self.board.variants
+        render = lambda: images.get(path, fallback_size=src_size).render(w, h)
+        return render() if variants is None else variants.get(path, affiliation, w, h, render)
+
+    def _collect(self):
+        """UI side: turn finished resamples into PhotoImages for their current waiters."""
+        self._poll_job = None
+        while True:
             try:
-                im = Image.open(path).convert("RGBA")
-                im.thumbnail(THUMB_SIZE, Image.LANCZOS)
-                tkimg = ImageTk.PhotoImage(im)
-            except Exception:
-                im = Image.new("RGBA", THUMB_SIZE, (230, 230, 230, 255))
-                tkimg = ImageTk.PhotoImage(im)
+                key, fut = self._done.get_nowait()
+            except queue.Empty:
+                break
+            job = self._jobs.get(key)
+            if job is None or job[0] is not fut:
+                continue  # cancelled, or replaced by a newer job for the same key
+            del self._jobs[key]
+            waiters = [cid for cid, gen in job[1] if self.pending.get(cid) == (gen, key)]
+            if not waiters or fut.cancelled() or fut.exception() is not None:
+                for cid in waiters:
+                    del self.pending[cid]
+                continue
+            tkimg = ImageTk.PhotoImage(fut.result())
+            self._bitmaps[key] = tkimg
+            for cid in waiters:
+                del self.pending[cid]
+                self._install(cid, key, tkimg)
+        if self._jobs:
+            self._poll_job = self.board.after(RESAMPLE_POLL_MS, self._collect)
+
+    def drain(self):
+        """Block until every queued resample has landed on the canvas (benchmarks)."""
+        while self._jobs:
+            wait([fut for fut, _ in self._jobs.values()])
+            self._collect()  # done callbacks may trail the futures by a moment; loop until they are in
+
+    def _install(self, cid, key, tkimg):
+        self._unref(cid)
+        self._previews.pop(cid, None)
+        self._held[cid] = tkimg
+        self.live[cid] = key
+        n = self._refs.get(key, 0)
+        if n == 0:
+            self.pixels += key[1] * key[2]
+        self._refs[key] = n + 1
+        self.board.itemconfig(cid, image=tkimg)
+
+    def _cancel(self, cid):
+        """Withdraw an item's outstanding request; a job nobody waits for any more is cancelled."""
+        req = self.pending.pop(cid, None)
+        if req is None:
+            return False
+        gen, key = req
+        job = self._jobs.get(key)
+        if job is not None:
+            job[1].remove((cid, gen))
+            if not job[1] and job[0].cancel():
+                del self._jobs[key]
+        return True
+
+    def release(self, cid):
+        """Swap an item's bitmap (or pending request) for the placeholder."""
+        waiting = self._cancel(cid)
+        had_preview = self._previews.pop(cid, None) is not None
+        if self._unref(cid) or waiting or had_preview:
+            self.board.itemconfig(cid, image=self.placeholder)
+
+    def forget(self, cid):
+        """Drop bookkeeping for an item that has been deleted."""
+        self._cancel(cid)
+        self._previews.pop(cid, None)
+        self._gen.pop(cid, None)
+        self._unref(cid)
+
+    def clear(self):
+        for fut, _ in self._jobs.values():
+            fut.cancel()
+        self._jobs.clear()
+        self.pending.clear()
+        self._previews.clear()
+        self._gen.clear()
+        self.live.clear()
+        self._held.clear()
+        self._refs.clear()
+        self.pixels = 0
+        self._tight_zoom = None
+
+    def _unref(self, cid):
+        key = self.live.pop(cid, None)
+        if key is None:
+            return False
+        del self._held[cid]
+        n = self._refs[key] - 1
+        if n:
+            self._refs[key] = n
+        else:
+            del self._refs[key]
+            self.pixels -= key[1] * key[2]
+        return True
+
+    def _items_in(self, margin):
+        """Image items whose extent may reach the viewport grown by ``margin`` viewports."""
+        board = self.board
+        x0, y0, x1, y1 = board.viewport()
+        pad = self._max_half * board.zoom
+        mx, my = (x1 - x0) * margin + pad, (y1 - y0) * margin + pad
+        return [it for it in board.find_overlapping(x0 - mx, y0 - my, x1 + mx, y1 + my)
+                if getattr(board.placed.get(it), "kind", None) == "image"]
+
+    def refresh(self):
+        """Rasterize near items, release far or stale ones, then enforce the budget.
+
+        Pure pans find live bitmaps already at the right size and leave them
+        alone; only a zoom, scale or affiliation change makes a live bitmap stale. A stale
+        bitmap with a resample on the way stays up until it is replaced.
+        While the budget can't cover the keep margin, only the viewport itself
+        is rasterized, until a zoom out makes bitmaps smaller again.
+        """
+        board = self.board
+        if self._tight_zoom is not None and board.zoom < self._tight_zoom:
+            self._tight_zoom = None
+        for cid in self._items_in(self.keep_margin if self._tight_zoom is None else 0):
+            self.rasterize(cid)
+        keep = set(self._items_in(self.evict_margin))
+        for cid, key in list(self.live.items()):
+            if cid not in keep or (cid not in self.pending
+                                   and key[1:] != (*board._display_size(board.placed[cid]), board.affiliation)):
+                self.release(cid)
+        for cid in [c for c in self.pending if c not in keep]:
+            self.release(cid)
+        if self.pixels > self.pixel_budget:
+            self._enforce_budget()
+
+    def _enforce_budget(self):
+        """Release live items farthest from the viewport centre until under budget.
+
+        Items beyond the keep margin go first. If that isn't enough, the keep
+        margin itself is given up (see refresh), so the next pan doesn't
+        rasterize what was just released.
+        """
+        board = self.board
+        x0, y0, x1, y1 = board.viewport()
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+
+        def dist(cid):
+            x, y = board.coords(cid)
+            return (x - cx) ** 2 + (y - cy) ** 2
+
+        for spared in (set(self._items_in(self.keep_margin)), set(self._items_in(0))):
+            for cid in sorted((c for c in self.live if c not in spared), key=dist, reverse=True):
+                if self.pixels <= self.pixel_budget:
+                    return
+                self.release(cid)
+            if self.pixels <= self.pixel_budget:
+                return
+            self._tight_zoom = board.zoom
 
-            self._imgrefs[path] = tkimg
-            lbl_img.configure(image=tkimg)
+# ---------- Canvas ----------
+SEL_TAG = "sel"  # carried by every selected item *and* its selection box
+GRID_TAG = "grid"
+GUIDE_TAG = "guide"
 
-            name = filename_to_name(path)
-            lbl_txt = ttk.Label(row, text=f"{idx}. {name}", wraplength=PALETTE_WIDTH-140, justify="left")
-            lbl_txt.grid(row=0, column=1, sticky="w", padx=(10, 0))
+class FontRegistry:
+    """Tk named fonts shared by every text item with the same family, size and weight.
+
+    Rescaling then only swaps which named font an item points at; Tk
+    doesn't have to parse and resolve a font description per item.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._fonts = {}
+
+    def get(self, family, size, weight="bold"):
+        key = (family, size, weight)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = tkfont.Font(root=self.root, family=family, size=size, weight=weight)
+        return font
+
+    def __len__(self):
+        return len(self._fonts)
 
-            def begin(ev, n=name, p=path):
-                self.on_start_drag(n, p, ev)
-            lbl_img.bind("<Button-1>", begin)
-            lbl_txt.bind("<Button-1>", begin)
 
-# ---------- Canvas ----------
 class BoardCanvas(tk.Canvas):
+    # snapping: a drag lines the selection up with nearby items' edges/centres, then the grid
+    snap_to_items = True
+    affiliation = None      # draw every symbol in this affiliation's colours (symbol_recolor); None = as drawn
+    snap_to_grid = False
+    show_grid = False
+
     def __init__(self, master, **kw):
         super().__init__(master, **kw)
-        self.configure(bg="white", width=CANVAS_SIZE[0], height=CANVAS_SIZE[1])
-        self.placed = {}        # id -> {kind: 'image'|'text', name, ...}
-        self.selected_id = None
-        self._drag = {"item": None, "x": 0, "y": 0}
+        self.world_size = BOARD_SIZE
+        self.configure(bg="white", width=CANVAS_SIZE[0], height=CANVAS_SIZE[1],
+                       scrollregion=(0, 0, BOARD_SIZE[0], BOARD_SIZE[1]),
+                       xscrollcommand=self._on_xscroll, yscrollcommand=self._on_yscroll)
+        self.model = BoardModel()  # what is on the board; this canvas only draws it
+        self.placed = {}        # canvas id -> model item (board_model.ImageItem / TextItem)
+        self._cids = {}         # model item id -> canvas id
+        self.selected = set()   # every selected item id
+        self.selected_id = None # primary selection (last clicked) for single-item controls
+        self._drag = {"mode": None, "x": 0, "y": 0, "x0": 0, "y0": 0, "band": None, "additive": False, "ids": ()}
+        self._moved_pending = None
+
+        # viewport: canvas coords = world coords × zoom
+        self.zoom = 1.0
+        shared = None
+        if SHARED_IMAGES:
+            from symbol_shared import SharedImageStore  # pulls in multiprocessing.shared_memory
+            shared = SharedImageStore.open()
+        self.images = SymbolImageCache(shared=shared)
+        self.variants = None    # symbol_recolor.VariantCache, from the first affiliation switch on
+        self.view = ViewportManager(self)
+        self.fonts = FontRegistry(self)
+        self._item_fonts = {}   # text canvas id -> shared named font currently applied
+        self._scrollbars = (None, None)
+        self._view_pending = None
+        self._grid_img = None   # one PhotoImage covering the viewport, moved in whole cells on scroll
+        self._grid_key = None
+        self._guides = (self.create_line(0, 0, 0, 0, fill="#e0457b", state="hidden", tags=(GUIDE_TAG,)),
+                        self.create_line(0, 0, 0, 0, fill="#e0457b", state="hidden", tags=(GUIDE_TAG,)))
 
         # interactions
         self.bind("<Button-1>", self._on_click)
         self.bind("<B1-Motion>", self._on_drag)
         self.bind("<ButtonRelease-1>", self._on_release)
+        self.bind("<Control-a>", lambda e: self.select_all())
         self.bind_all("<Delete>", self._delete_selected)
         self.bind_all("<plus>", lambda e: self.resize_selected(1.15))
         self.bind_all("<minus>", lambda e: self.resize_selected(1/1.15))
@@ -194,6 +743,14 @@ class BoardCanvas(tk.Canvas):
         self.menu.add_separator()
         self.menu.add_command(label="Delete", command=lambda: self._delete_selected())
         self.bind("<Button-3>", self._show_menu)
+        # zoom & pan
+        self.bind("<MouseWheel>", self._wheel_zoom)
+        self.bind("<Button-4>", lambda e: self.zoom_by(ZOOM_STEP, (e.x, e.y)))
+        self.bind("<Button-5>", lambda e: self.zoom_by(1/ZOOM_STEP, (e.x, e.y)))
+        self.bind("<ButtonPress-2>", lambda e: self.scan_mark(e.x, e.y))
+        self.bind("<B2-Motion>", lambda e: self.scan_dragto(e.x, e.y, gain=1))
+        self.bind("<Control-0>", lambda e: self.set_zoom(1.0))
+        self.bind("<Configure>", lambda e: self._schedule_view_update())
 
         # hint
         self.hint = self.create_text(
@@ -205,199 +762,575 @@ class BoardCanvas(tk.Canvas):
     # ---- placement ----
     def place_symbol(self, name, src, x, y, base_px=160):
         if src == SPECIAL_TEXT_TOKEN:
-            # create a text item
-            default_text = "UNIT"
-            base_size = 18
-            item = self.create_text(x, y, text=default_text, fill="#000000", font=("Segoe UI", base_size, "bold"))
-            self.placed[item] = {
-                "kind": "text",
-                "name": name,
-                "text": default_text,
-                "font_family": "Segoe UI",
-                "font_size_base": base_size,
-                "scale": 1.0,
-            }
-            if self.hint:
-                self.delete(self.hint)
-                self.hint = None
-            self._update_selection(item)
-            self.event_generate("<<SymbolPlaced>>")
-            return item
+            item = self._create_text_item(name, x, y)
+        else:
+            # image symbol: decoded once per source and shared by every placement
+            pyr = self.images.get(src, fallback_size=(base_px, int(base_px*0.7)))
+            scale = min(1.0, base_px / max(1, max(pyr.size)))
+            item = self._create_image_item(name, src, pyr.size, scale, x, y)
 
-        # image symbol
-        try:
-            pil = Image.open(src).convert("RGBA")
-        except Exception:
-            pil = Image.new("RGBA", (base_px, int(base_px*0.7)), (0, 0, 0, 0))
+        if self.hint:
+            self.delete(self.hint)
+            self.hint = None
+        self._update_selection(item)
+        self.event_generate("<<SymbolPlaced>>")
+        return item
+
+    def place_many(self, rows, resolve=None):
+        """Place many units in one batch; returns (canvas ids, rows whose symbol didn't resolve).
+
+        ``rows`` are unit_import.UnitRow-like tuples (symbol, x, y[, scale[, text]]) in
+        world coordinates. ``resolve`` maps a symbol to a file (default: it
+        must already be a path). Nothing is selected and listeners get a
+        single <<SymbolPlaced>>, unlike a loop over place_symbol.
+        """
+        if resolve is None:
+            resolve = lambda s: s if os.path.isfile(s) else None
+        items, missing = add_units(self.model, rows, resolve)
+        return self.add_model_items(items), missing
+
+    def _create_text_item(self, name, x, y, text="UNIT", font_family="Segoe UI", base_size=18, scale=1.0):
+        item = self.model.add_text(name, x / self.zoom, y / self.zoom, text=text,
+                                   font_family=font_family, font_size_base=base_size, scale=scale)
+        return self._draw_item(item)
+
+    def _create_image_item(self, name, src, src_size, scale, x, y):
+        item = self.model.add_image(name, src, src_size, x / self.zoom, y / self.zoom, scale)
+        return self._draw_item(item)
+
+    def _draw_item(self, item, rasterize=True):
+        """Create the canvas object for a model item; returns its canvas id."""
+        x, y = item.x * self.zoom, item.y * self.zoom
+        if item.kind == "image":
+            # the bitmap itself lives in self.view; the model only keeps what rebuilds it
+            cid = self.create_image(x, y, image=self.view.placeholder)
+            self.placed[cid] = item
+            if rasterize:
+                self.view.rasterize(cid)
+        elif item.kind == "line":
+            z, pts = self.zoom, item.points
+            coords = [(item.x + p) * z if i % 2 == 0 else (item.y + p) * z for i, p in enumerate(pts)]
+            cid = self.create_line(*coords, fill="#4b5563", width=1.5)
+            self.placed[cid] = item
+        else:
+            font = self.fonts.get(item.font_family, max(8, int(item.font_size_base * item.scale * self.zoom)))
+            cid = self.create_text(x, y, text=item.text, fill="#000000", font=font)
+            self.placed[cid] = item
+            self._item_fonts[cid] = font
+        self._cids[item.id] = cid
+        return cid
 
-        scale = min(1.0, base_px / max(1, max(pil.size)))
-        w = max(1, int(pil.width * scale))
-        h = max(1, int(pil.height * scale))
-        tkimg = ImageTk.PhotoImage(pil.resize((w, h), Image.LANCZOS))
+    def add_model_items(self, items):
+        """Draw items just added to ``self.model`` as one batch.
 
-        cid = self.create_image(x, y, image=tkimg)
-        self.placed[cid] = {"kind": "image", "name": name, "path": src, "pil": pil, "scale": scale, "tk": tkimg}
-        if self.hint:
+        Bitmaps come from a single view refresh (so only what is on screen is
+        rasterized), the board grows to fit, and listeners hear one
+        <<SymbolPlaced>> for the lot. Returns the new canvas ids.
+        """
+        cids = [self._draw_item(item, rasterize=False) for item in items]
+        if cids and self.hint:
             self.delete(self.hint)
             self.hint = None
+        self._grow_world(cids)
+        self._update_view()
+        self.event_generate("<<SymbolPlaced>>")
+        return cids
 
-        self._update_selection(cid)
+    def _grow_world(self, cids):
+        """Enlarge the board (never shrink it) so every item in ``cids`` fits."""
+        if not cids:
+            return
+        x1, y1 = self.world_size
+        z = self.zoom
+        box = self.bbox(*cids)  # one Tk call; images still show the placeholder, so add their extents below
+        if box:
+            x1, y1 = max(x1, box[2] / z + BOARD_PAD), max(y1, box[3] / z + BOARD_PAD)
+        for cid in cids:
+            rec = self.placed[cid]
+            if rec.kind == "image":
+                x1 = max(x1, rec.x + rec.src_size[0] * rec.scale / 2 + BOARD_PAD)
+                y1 = max(y1, rec.y + rec.src_size[1] * rec.scale / 2 + BOARD_PAD)
+        if (x1, y1) != self.world_size:
+            self.world_size = (x1, y1)
+            self.configure(scrollregion=(0, 0, x1 * z, y1 * z))
+
+    def cid_for(self, item_id):
+        """Canvas id currently drawing model item ``item_id`` (None if it isn't shown)."""
+        return self._cids.get(item_id)
+
+    def set_model(self, model):
+        """Show ``model`` (e.g. one built or loaded by a script) in place of the current board."""
+        self._clear_view()
+        self.model = model
+        for item in model.ordered():
+            self._draw_item(item, rasterize=False)  # the view refresh rasterizes what's in range
+        if self.placed and self.hint:
+            self.delete(self.hint)
+            self.hint = None
+        self._show_hint_if_empty()
+        self._update_view()
         self.event_generate("<<SymbolPlaced>>")
-        return cid
+        self.event_generate("<<SelectionChanged>>")
+
+    def _display_size(self, rec):
+        f = rec.scale * self.zoom
+        return max(1, int(rec.src_size[0] * f)), max(1, int(rec.src_size[1] * f))
 
     # ---- selection & move ----
+    def _item_at(self, x, y):
+        """Topmost placed item under canvas point (x, y), or None.
+
+        The canvas's bounding-box search finds the candidates; a symbol then
+        only counts where its pixels are solid (per its pyramid's hit mask),
+        so clicks on transparent margins reach the items underneath.
+        """
+        s = HIT_SLOP
+        for it in reversed(self.find_overlapping(x - s, y - s, x + s, y + s)):
+            rec = self.placed.get(it)
+            if rec is not None and (rec.kind != "image" or self._image_hit(it, rec, x, y)):
+                return it
+        return None
+
+    def _image_hit(self, cid, rec, x, y):
+        if rec.path not in self.images:
+            return True  # not decoded: its rectangle will do rather than decoding on a click
+        w, h = self._display_size(rec)
+        cx, cy = self.coords(cid)
+        return self.images.get(rec.path).hit(w, h, x - (cx - w // 2), y - (cy - h // 2), HIT_SLOP)
+
     def _on_click(self, ev):
-        hit = self.find_closest(ev.x, ev.y)
-        if hit and self.type(hit) in ("image", "text"):
-            if self.selected_id == hit[0]:
-                self._drag["item"] = hit
-                self._drag["x"], self._drag["y"] = ev.x, ev.y
+        x, y = self.canvasx(ev.x), self.canvasy(ev.y)
+        additive = bool(ev.state & 0x0001)  # Shift held
+        hit = self._item_at(x, y)
+        if hit is not None:
+            if additive:
+                self.toggle_selection(hit)
+            elif hit in self.selected:
+                self.selected_id = hit
+                self._begin_move(x, y)
             else:
-                self._update_selection(hit[0])
+                self._update_selection(hit)
             return
-        self._update_selection(None)
+
+        # empty space → rubber band
+        if not additive:
+            self._update_selection(None)
+        band = self.create_rectangle(x, y, x, y, dash=(2, 2), outline="#4A90E2", tags=("band",))
+        self._drag.update(mode="band", x0=x, y0=y, band=band, additive=additive)
+
+    def _begin_move(self, x, y):
+        """Start dragging the selection; snapping state is computed here, once per drag."""
+        cids = list(self.selected)
+        boxes = [self._world_box(c) for c in cids]
+        box = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+               max(b[2] for b in boxes), max(b[3] for b in boxes))
+        edges = None
+        if self.snap_to_items:
+            x0, y0, x1, y1 = self.viewport()
+            mx, my = (x1 - x0) * SNAP_MARGIN, (y1 - y0) * SNAP_MARGIN
+            others = [it for it in self.find_overlapping(x0 - mx, y0 - my, x1 + mx, y1 + my)
+                      if it in self.placed and it not in self.selected]
+            edges = EdgeIndex(self._world_box(c) for c in others)
+        self._drag.update(mode="move", x=x, y=y, x0=x, y0=y, ids=[self.placed[c].id for c in cids],
+                          box=box, edges=edges, applied=(0.0, 0.0))
+
+    def _world_box(self, cid):
+        rec = self.placed[cid]
+        if rec.kind == "image":  # drawn centred on (x, y)
+            hw, hh = rec.src_size[0] * rec.scale / 2, rec.src_size[1] * rec.scale / 2
+            return rec.x - hw, rec.y - hh, rec.x + hw, rec.y + hh
+        x0, y0, x1, y1 = self.bbox(cid)
+        z = self.zoom
+        return x0 / z, y0 / z, x1 / z, y1 / z
 
     def _on_drag(self, ev):
-        if self._drag["item"]:
-            dx, dy = ev.x - self._drag["x"], ev.y - self._drag["y"]
-            self.move(self._drag["item"], dx, dy)
-            self._drag["x"], self._drag["y"] = ev.x, ev.y
-            self.event_generate("<<SymbolMoved>>")
+        x, y = self.canvasx(ev.x), self.canvasy(ev.y)
+        if self._drag["mode"] == "move":
+            d, z = self._drag, self.zoom
+            tx, ty = (x - d["x0"]) / z, (y - d["y0"]) / z  # unsnapped world offset since the press
+            gx = gy = None
+            if (self.snap_to_items or self.snap_to_grid) and not ev.state & ALT_MASK:  # Alt drags freely
+                bx0, by0, bx1, by1 = d["box"]
+                sx, sy, gx, gy = snap_box((bx0 + tx, by0 + ty, bx1 + tx, by1 + ty), d["edges"],
+                                          GRID_SIZE if self.snap_to_grid else None, SNAP_DISTANCE / z)
+                tx, ty = tx + sx, ty + sy
+            dx, dy = tx - d["applied"][0], ty - d["applied"][1]
+            if dx or dy:
+                self.move(SEL_TAG, dx * z, dy * z)  # one call moves every selected item and its box
+                self.model.move(d["ids"], dx, dy)
+                d["applied"] = (tx, ty)
+                self._notify_moved()
+            self._show_guides(gx, gy)
+            d["x"], d["y"] = x, y
+        elif self._drag["mode"] == "band":
+            self.coords(self._drag["band"], self._drag["x0"], self._drag["y0"], x, y)
 
     def _on_release(self, ev):
-        self._drag["item"] = None
+        if self._drag["mode"] == "band":
+            x0, y0, x1, y1 = self.coords(self._drag["band"])
+            self.delete(self._drag["band"])
+            hits = [it for it in self.find_overlapping(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+                    if it in self.placed]
+            if hits:
+                if self._drag["additive"]:
+                    hits = list(self.selected) + hits
+                self.set_selection(hits)
+        elif self._drag["mode"] == "move":
+            self._show_guides(None, None)
+        self._drag.update(mode=None, band=None, additive=False, ids=(), edges=None)
+
+    def _show_guides(self, gx, gy):
+        """Draw the vertical guide at world x ``gx`` and the horizontal one at ``gy`` (None hides)."""
+        x0, y0, x1, y1 = self.viewport()
+        vline, hline = self._guides
+        if gx is None:
+            self.itemconfigure(vline, state="hidden")
+        else:
+            self.coords(vline, gx * self.zoom, y0, gx * self.zoom, y1)
+            self.itemconfigure(vline, state="normal")
+            self.tag_raise(vline)
+        if gy is None:
+            self.itemconfigure(hline, state="hidden")
+        else:
+            self.coords(hline, x0, gy * self.zoom, x1, gy * self.zoom)
+            self.itemconfigure(hline, state="normal")
+            self.tag_raise(hline)
+
+    def set_affiliation(self, affiliation):
+        """Draw every symbol in ``affiliation``'s colours (None: as drawn).
+
+        Symbols in view keep their bitmap until the recoloured one arrives;
+        the rest are recoloured when they come into view. Sized images are
+        cached, so switching back and forth only recolours.
+        """
+        if affiliation == self.affiliation:
+            return
+        if self.variants is None:
+            from symbol_recolor import VariantCache  # NumPy loads on first use
+            self.variants = VariantCache()
+        self.affiliation = affiliation
+        self.view.refresh()
+
+    def set_grid(self, show=None, snap=None):
+        """Show/hide the grid and switch grid snapping; None leaves a setting as it is."""
+        if show is not None:
+            self.show_grid = show
+        if snap is not None:
+            self.snap_to_grid = snap
+        self._update_grid()
+
+    def _update_grid(self):
+        """Keep the single grid image under the viewport.
+
+        The image spans the viewport plus one cell and is drawn once per zoom
+        or window size; scrolling only moves it by whole cells.
+        """
+        if not self.show_grid:
+            if self._grid_img is not None:
+                self.delete(GRID_TAG)
+                self._grid_img = self._grid_key = None
+            return
+        step = GRID_SIZE * self.zoom
+        while step < GRID_MIN_PX:
+            step *= 2
+        x0, y0, x1, y1 = self.viewport()
+        w, h = int(x1 - x0 + step) + 2, int(y1 - y0 + step) + 2
+        key = (step, w, h)
+        if key != self._grid_key:
+            from PIL import ImageDraw
+            im = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(im)
+            for i in range(int(w / step) + 1):
+                draw.line((round(i * step), 0, round(i * step), h), fill=(200, 205, 220, 255))
+            for i in range(int(h / step) + 1):
+                draw.line((0, round(i * step), w, round(i * step)), fill=(200, 205, 220, 255))
+            self._grid_img = ImageTk.PhotoImage(im)
+            self._grid_key = key
+            self.delete(GRID_TAG)
+            self.create_image(0, 0, image=self._grid_img, anchor="nw", tags=(GRID_TAG,))
+            self.tag_lower(GRID_TAG)
+        self.coords(GRID_TAG, math.floor(x0 / step) * step, math.floor(y0 / step) * step)
+
+    def _lower_selection_boxes(self):
+        self.tag_lower("selbox")
+        self.tag_lower(GRID_TAG)  # still under everything
+
+    def _notify_moved(self):
+        """Coalesce a burst of moves into a single <<SymbolMoved>> per idle cycle."""
+        if self._moved_pending is None:
+            self._moved_pending = self.after_idle(self._flush_moved)
+
+    def _flush_moved(self):
+        self._moved_pending = None
+        self.event_generate("<<SymbolMoved>>")
 
     def _bbox_for_item(self, item_id):
-        bbox = self.bbox(item_id)  # (x0, y0, x1, y1)
-        return bbox
+        """Canvas (x0, y0, x1, y1) of an item; images are sized from the model, not their current bitmap."""
+        if self.placed[item_id].kind != "image":
+            return self.bbox(item_id)
+        z = self.zoom  # the bitmap may still be at the old size while its resample is on the way
+        x0, y0, x1, y1 = self._world_box(item_id)
+        return x0 * z, y0 * z, x1 * z, y1 * z
+
+    def _selected_items(self):
+        """Selected ids in stacking order (bottom → top)."""
+        return [it for it in self.find_withtag(SEL_TAG) if it in self.placed]
+
+    def set_selection(self, ids, primary=None):
+        ids = [i for i in dict.fromkeys(ids) if i in self.placed]
+        self.dtag(SEL_TAG, SEL_TAG)
+        self.selected = set(ids)
+        for cid in ids:
+            self.addtag_withtag(SEL_TAG, cid)
+        if primary not in self.selected:
+            primary = ids[-1] if ids else None
+        self.selected_id = primary
+        self._redraw_selection()
+        self.event_generate("<<SelectionChanged>>")
 
     def _update_selection(self, cid_or_none):
-        for it in self.find_withtag("selbox"):
-            self.delete(it)
-        self.selected_id = cid_or_none
-        if cid_or_none:
-            bbox = self._bbox_for_item(cid_or_none)
+        self.set_selection([cid_or_none] if cid_or_none else [])
+
+    def toggle_selection(self, cid):
+        if cid in self.selected:
+            self.set_selection([i for i in self.selected if i != cid])
+        else:
+            self.set_selection(list(self.selected) + [cid], primary=cid)
+
+    def select_all(self):
+        self.set_selection(list(self.placed.keys()))
+
+    def _redraw_selection(self):
+        self.delete("selbox")
+        for cid in self.selected:
+            bbox = self._bbox_for_item(cid)
             if bbox:
                 x0, y0, x1, y1 = bbox
-                box = self.create_rectangle(x0, y0, x1, y1, dash=(3, 2),
-                                            outline="#4A90E2", tags=("selbox",))
-                self.tag_lower(box)
-        self.event_generate("<<SelectionChanged>>")
+                self.create_rectangle(x0, y0, x1, y1, dash=(3, 2),
+                                      outline="#4A90E2", tags=("selbox", SEL_TAG))
+        self._lower_selection_boxes()
+
+    def _show_hint_if_empty(self):
+        if not self.placed and not self.hint:
+            x0, y0, x1, y1 = self.viewport()
+            self.hint = self.create_text(
+                (x0 + x1)//2, (y0 + y1)//2,
+                text="Drag from palette → drop here",
+                fill="#8b8b8b", font=("Segoe UI", 14, "italic")
+            )
 
     # ---- delete / clear ----
     def _delete_selected(self, ev=None):
-        if self.selected_id and self.selected_id in self.placed:
-            self.delete(self.selected_id)
-            del self.placed[self.selected_id]
-            self.selected_id = None
-            if not self.find_all() and not self.hint:
-                self.hint = self.create_text(
-                    CANVAS_SIZE[0]//2, CANVAS_SIZE[1]//2,
-                    text="Drag from palette → drop here",
-                    fill="#8b8b8b", font=("Segoe UI", 14, "italic")
-                )
-            self.event_generate("<<SymbolRemoved>>")
-            self.event_generate("<<SelectionChanged>>")
+        if not self.selected:
+            return
+        self.delete(SEL_TAG)  # items and their boxes in one call
+        self.model.remove([self.placed[cid].id for cid in self.selected])
+        for cid in self.selected:
+            self._forget_item(cid)
+        self.selected = set()
+        self.selected_id = None
+        self._show_hint_if_empty()
+        self.event_generate("<<SymbolRemoved>>")
+        self.event_generate("<<SelectionChanged>>")
 
-    def clear_board(self):
-        for cid in list(self.placed.keys()):
+    def _forget_item(self, cid):
+        item = self.placed.pop(cid)
+        self._cids.pop(item.id, None)
+        self._item_fonts.pop(cid, None)
+        self.view.forget(cid)
+
+    def _clear_view(self):
+        for cid in self.placed:
             self.delete(cid)
+        self.delete("selbox")
         self.placed.clear()
+        self._cids.clear()
+        self._item_fonts.clear()
+        self.view.clear()
+        self.selected = set()
         self.selected_id = None
-        if not self.hint:
-            self.hint = self.create_text(
-                CANVAS_SIZE[0]//2, CANVAS_SIZE[1]//2,
-                text="Drag from palette → drop here",
-                fill="#8b8b8b", font=("Segoe UI", 14, "italic")
-            )
+
+    def clear_board(self):
+        self._clear_view()
+        self.model.clear()
+        self._show_hint_if_empty()
         self.event_generate("<<SymbolRemoved>>")
         self.event_generate("<<SelectionChanged>>")
 
     # ---- resize (images & text) ----
+    def _scalable_selection(self):
+        """Selected items a resize applies to: connector lines keep their drawn geometry."""
+        return [cid for cid in self._selected_items() if self.placed[cid].kind != "line"]
+
     def resize_selected(self, factor):
-        cid = self.selected_id
-        if not cid or cid not in self.placed:
-            return
-        rec = self.placed[cid]
-        rec["scale"] = max(0.2, min(4.0, rec.get("scale", 1.0) * factor))
-        self._apply_scale(cid, rec)
+        cids = self._scalable_selection()
+        for cid in cids:
+            rec = self.placed[cid]
+            rec.scale = max(0.2, min(4.0, rec.scale * factor))
+        self._apply_scale_many(cids)
 
     def set_selected_scale_abs(self, scale_abs):
-        cid = self.selected_id
-        if not cid or cid not in self.placed:
-            return
-        rec = self.placed[cid]
-        rec["scale"] = max(0.2, min(4.0, scale_abs))
-        self._apply_scale(cid, rec)
+        cids = self._scalable_selection()
+        for cid in cids:
+            self.placed[cid].scale = max(0.2, min(4.0, scale_abs))
+        self._apply_scale_many(cids)
 
     def get_selected_scale(self):
         cid = self.selected_id
         if not cid or cid not in self.placed:
             return None
-        return self.placed[cid].get("scale", 1.0)
+        return self.placed[cid].scale
 
     def _apply_scale(self, cid, rec):
-        if rec["kind"] == "image":
-            pil = rec["pil"]
-            w = max(1, int(pil.width * rec["scale"]))
-            h = max(1, int(pil.height * rec["scale"]))
-            tkimg = ImageTk.PhotoImage(pil.resize((w, h), Image.LANCZOS))
-            rec["tk"] = tkimg
-            self.itemconfig(cid, image=tkimg)
-        else:  # text
-            base = rec.get("font_size_base", 18)
-            size = max(8, int(base * rec["scale"]))
-            self.itemconfig(cid, font=(rec.get("font_family", "Segoe UI"), size, "bold"))
-        self._update_selection(cid)
+        self._apply_scale_many([cid])
+
+    def _apply_scale_many(self, cids):
+        """Rescale items, resampling each distinct (source, size) pair only once."""
+        if not cids:
+            return
+        for cid in cids:
+            rec = self.placed[cid]
+            if rec.kind == "image":
+                # shared bitmaps are keyed by (path, size): one resample per distinct pair
+                if cid in self.view.live or cid in self.view.pending:
+                    self.view.rasterize(cid)
+            elif rec.kind == "text":
+                self._apply_text_font(cid, rec)
+        self._redraw_selection()
+        self._schedule_view_update()
+        self._notify_moved()
+
+    def _apply_text_font(self, cid, rec):
+        font = self.fonts.get(rec.font_family, max(8, int(rec.font_size_base * rec.scale * self.zoom)))
+        if self._item_fonts.get(cid) is not font:  # most small scale steps round to the same size
+            self._item_fonts[cid] = font
+            self.itemconfig(cid, font=font)
 
     def _wheel_resize(self, ev):
-        if self.selected_id:
+        if self.selected:
             self.resize_selected(1.15 if ev.delta > 0 else 1/1.15)
 
     # ---- duplicate / arrange ----
     def duplicate_selected(self):
-        cid = self.selected_id
-        if not cid or cid not in self.placed:
-            return
-        rec = self.placed[cid]
-        x, y = self.coords(cid)
-
-        if rec["kind"] == "image":
-            nid = self.place_symbol(rec["name"], rec["path"], x + 25, y + 25, base_px=max(rec["pil"].size))
-            self.placed[nid]["scale"] = rec["scale"]
-            self._apply_scale(nid, self.placed[nid])
-        else:
-            nid = self.place_symbol(rec["name"], SPECIAL_TEXT_TOKEN, x + 25, y + 25)
-            self.placed[nid]["text"] = rec["text"]
-            self.itemconfig(nid, text=rec["text"])
-            self.placed[nid]["font_family"] = rec.get("font_family", "Segoe UI")
-            self.placed[nid]["font_size_base"] = rec.get("font_size_base", 18)
-            self.placed[nid]["scale"] = rec["scale"]
-            self._apply_scale(nid, self.placed[nid])
+        new_ids = []
+        for cid in self._selected_items():
+            rec = self.placed[cid]
+            x, y = self.coords(cid)
+            if rec.kind == "image":
+                # shares the decoded source and the current bitmap with the original
+                nid = self._create_image_item(rec.name, rec.path, rec.src_size, rec.scale, x + 25, y + 25)
+            elif rec.kind == "line":
+                nid = self._draw_item(self.model.add_line(rec.name, rec.x + 25 / self.zoom, rec.y + 25 / self.zoom,
+                                                          rec.points, rec.scale))
+            else:
+                nid = self._create_text_item(rec.name, x + 25, y + 25, text=rec.text, font_family=rec.font_family,
+                                             base_size=rec.font_size_base, scale=rec.scale)
+            new_ids.append(nid)
+        if new_ids:
+            self.set_selection(new_ids)
+            self.event_generate("<<SymbolPlaced>>")
 
     def _raise_selected(self):
-        if self.selected_id:
-            self.tag_raise(self.selected_id)
+        if self.selected:
+            self.model.raise_([self.placed[c].id for c in self.selected])
+            self.tag_raise(SEL_TAG)  # keeps the group's relative order
+            self._lower_selection_boxes()
 
     def _lower_selected(self):
-        if self.selected_id:
-            self.tag_lower(self.selected_id)
+        if self.selected:
+            self.model.lower([self.placed[c].id for c in self.selected])
+            self.tag_lower(SEL_TAG)
+            self._lower_selection_boxes()
 
     def nudge(self, dx, dy):
-        if self.selected_id:
-            self.move(self.selected_id, dx, dy)
-            self.event_generate("<<SymbolMoved>>")
+        if self.selected:
+            self.move(SEL_TAG, dx, dy)
+            self.model.move([self.placed[c].id for c in self.selected], dx / self.zoom, dy / self.zoom)
+            self._notify_moved()
+
+    # ---- zoom & pan ----
+    def attach_scrollbars(self, xsb, ysb):
+        self._scrollbars = (xsb, ysb)
+        xsb.configure(command=self.xview)
+        ysb.configure(command=self.yview)
+
+    def _on_xscroll(self, first, last):
+        if self._scrollbars[0] is not None:
+            self._scrollbars[0].set(first, last)
+        self._schedule_view_update()
+
+    def _on_yscroll(self, first, last):
+        if self._scrollbars[1] is not None:
+            self._scrollbars[1].set(first, last)
+        self._schedule_view_update()
+
+    def viewport(self):
+        """Visible region in canvas coordinates (x0, y0, x1, y1)."""
+        x0, y0 = self.canvasx(0), self.canvasy(0)
+        w = self.winfo_width() if self.winfo_width() > 1 else CANVAS_SIZE[0]
+        h = self.winfo_height() if self.winfo_height() > 1 else CANVAS_SIZE[1]
+        return x0, y0, x0 + w, y0 + h
+
+    def world_coords(self, cid):
+        item = self.placed[cid]
+        return item.x, item.y
+
+    def _wheel_zoom(self, ev):
+        if ev.state & 0x0004:  # Ctrl+wheel resizes the selection instead
+            return
+        self.zoom_by(ZOOM_STEP if ev.delta > 0 else 1/ZOOM_STEP, (ev.x, ev.y))
+
+    def zoom_by(self, factor, anchor=None):
+        self.set_zoom(self.zoom * factor, anchor)
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom about ``anchor`` (widget coords; default: viewport centre)."""
+        zoom = max(ZOOM_MIN, min(ZOOM_MAX, zoom))
+        f = zoom / self.zoom
+        if abs(f - 1.0) < 1e-9:
+            return
+        x0, y0, x1, y1 = self.viewport()
+        ax, ay = anchor if anchor else ((x1 - x0) / 2, (y1 - y0) / 2)
+        cx, cy = self.canvasx(ax), self.canvasy(ay)
+
+        self.scale("all", 0, 0, f, f)  # positions only; bitmaps are redone below
+        self.zoom = zoom
+        W, H = self.world_size[0] * zoom, self.world_size[1] * zoom
+        self.configure(scrollregion=(0, 0, W, H))
+        # keep the board point under the anchor fixed on screen
+        self.xview_moveto(max(0.0, cx * f - ax) / W)
+        self.yview_moveto(max(0.0, cy * f - ay) / H)
+
+        for cid, rec in self.placed.items():
+            if rec.kind == "text":
+                self._apply_text_font(cid, rec)
+        self._update_view()
+        self._redraw_selection()
+        self.event_generate("<<ViewChanged>>")
+
+    def _schedule_view_update(self):
+        if self._view_pending is None:
+            self._view_pending = self.after_idle(self._flush_view)
+
+    def _flush_view(self):
+        self._view_pending = None
+        self._update_view()
+
+    def _update_view(self):
+        self.view.refresh()
+        self._update_grid()
 
     # ---- context menu ----
     def _show_menu(self, ev):
-        hit = self.find_closest(ev.x, ev.y)
-        if hit and self.type(hit) in ("image", "text"):
-            self._update_selection(hit[0])
-            # Enable/disable Edit Text depending on kind
-            if self.placed.get(self.selected_id, {}).get("kind") == "text":
-                self.menu.entryconfig("Edit Text…", state="normal")
+        hit = self._item_at(self.canvasx(ev.x), self.canvasy(ev.y))
+        if hit is not None:
+            if hit in self.selected:
+                self.selected_id = hit
             else:
-                self.menu.entryconfig("Edit Text…", state="disabled")
+                self._update_selection(hit)
+            # Edit Text only makes sense for a single text item
+            single_text = len(self.selected) == 1 and self.placed[hit].kind == "text"
+            self.menu.entryconfig("Edit Text…", state="normal" if single_text else "disabled")
             try:
                 self.menu.tk_popup(ev.x_root, ev.y_root)
             finally:
@@ -408,13 +1341,13 @@ class BoardCanvas(tk.Canvas):
         if not self.selected_id or self.selected_id not in self.placed:
             return
         rec = self.placed[self.selected_id]
-        if rec["kind"] != "text":
+        if rec.kind != "text":
             return
         if new_text is None:
             # pop a small dialog
             top = tk.Toplevel(self); top.title("Edit Text"); top.grab_set()
             tk.Label(top, text="Unit code:").pack(anchor="w", padx=10, pady=(10,2))
-            ent = ttk.Entry(top); ent.insert(0, rec.get("text","UNIT")); ent.pack(fill="x", padx=10)
+            ent = ttk.Entry(top); ent.insert(0, rec.text); ent.pack(fill="x", padx=10)
             def ok():
                 txt = ent.get().strip()
                 self._apply_text_change(self.selected_id, txt or "UNIT")
@@ -426,10 +1359,10 @@ class BoardCanvas(tk.Canvas):
 
     def _apply_text_change(self, item_id, text):
         rec = self.placed[item_id]
-        rec["text"] = text
+        rec.text = text
         self.itemconfig(item_id, text=text)
-        self._update_selection(item_id)
-        self.event_generate("<<SymbolMoved>>")  # refresh inspector list bbox
+        self._redraw_selection()
+        self._notify_moved()  # refresh inspector list bbox
 
 # ---------- Drag ghost ----------
 class DragGhost:
@@ -459,7 +1392,8 @@ class DragGhost:
         widget = self.root.winfo_containing(ev.x_root, ev.y_root)
         self._cleanup()
         if isinstance(widget, BoardCanvas):
-            x = widget.canvasx(ev.x); y = widget.canvasy(ev.y)
+            x = widget.canvasx(ev.x_root - widget.winfo_rootx())
+            y = widget.canvasy(ev.y_root - widget.winfo_rooty())
             self.on_drop(widget, self.name, self.src, x, y)
 
     def _cleanup(self):
@@ -550,34 +1484,40 @@ class Inspector(ttk.Frame):
         except tk.TclError:
             return
         self.lbl_scale.configure(text=str(int(val)))
-        if self.board.selected_id:
+        if self.board.selected:
             self.board.set_selected_scale_abs(val/100.0)
 
     def refresh(self, ev=None):
         # list placed
+        lines = ["Placed symbols:\n\n"]
+        i = 0
+        for rec in self.board.placed.values():
+            if rec.kind == "line":
+                continue  # connectors aren't worth a row
+            i += 1
+            label = rec.name if rec.kind == "image" else f'{rec.name}: "{rec.text}"'
+            lines.append(f"{i}. {label} @ ({int(rec.x)}, {int(rec.y)})\n")
         self.txt.delete("1.0", "end")
-        self.txt.insert("end", "Placed symbols:\n\n")
-        for i, cid in enumerate(self.board.placed.keys(), 1):
-            x, y = self.board.coords(cid)
-            rec = self.board.placed[cid]
-            label = rec["name"] if rec["kind"] == "image" else f'{rec["name"]}: "{rec.get("text","")}"'
-            self.txt.insert("end", f"{i}. {label} @ ({int(x)}, {int(y)})\n")
+        self.txt.insert("end", "".join(lines))  # one Tk call however full the board is
 
         # selection panel
         rec = self.board.placed.get(self.board.selected_id)
         if rec:
-            if rec["kind"] == "image":
-                self.sel_name.configure(text=rec["name"])
+            if len(self.board.selected) > 1:
+                self.sel_name.configure(text=f"{len(self.board.selected)} items selected")
+                self._set_text_controls_enabled(False)
+            elif rec.kind != "text":
+                self.sel_name.configure(text=rec.name)
                 self._set_text_controls_enabled(False)
             else:
-                self.sel_name.configure(text=f'{rec["name"]} (text)')
-                self.text_var.set(rec.get("text", "UNIT"))
+                self.sel_name.configure(text=f'{rec.name} (text)')
+                self.text_var.set(rec.text)
                 self._set_text_controls_enabled(True)
 
             # sync slider safely
             self._suspend_slider_cb = True
             try:
-                scale_pct = int(rec.get("scale", 1.0) * 100)
+                scale_pct = int(rec.scale * 100)
                 self.scale_slider.set(scale_pct)
                 self.lbl_scale.configure(text=str(scale_pct))
             finally:
@@ -592,10 +1532,24 @@ class Inspector(ttk.Frame):
                 self._suspend_slider_cb = False
             self.text_var.set("")
             self._set_text_controls_enabled(False)
+# ---------- Instrumentation ----------
+HOT_PATHS = [("BoardCanvas", "_on_drag"), ("BoardCanvas", "_apply_scale"), ("BoardCanvas", "_apply_scale_many"),
+             ("Inspector", "refresh"), ("SymbolPalette", "load_folder"), ("DragGhost", "_follow")]
+
+def instrument_hot_paths():
+    """Wrap the interaction handlers with timers; call before the App is built."""
+    perf = PerfRecorder()
+    for cls_name, meth in HOT_PATHS:
+        perf.instrument(globals()[cls_name], meth)
+    return perf
+
 # ---------- App ----------
 class App(tk.Tk):
-    def __init__(self):
+    def __init__(self, perf=None, startup=None):
         super().__init__()
+        self.perf = perf
+        self.startup = startup or StartupTimer(_STARTED)
+        self.startup.mark("imports + Tk")
         self.title("Symbol Builder (with Text Box / Unit Code)")
         self.configure(bg=BG)
         self.geometry(f"{PALETTE_WIDTH+CANVAS_SIZE[0]+RIGHT_PANEL_WIDTH}x{CANVAS_SIZE[1]+90}")
@@ -609,10 +1563,11 @@ class App(tk.Tk):
         center.pack(side="left", fill="both", expand=True)
         right.pack(side="right", fill="y")
 
-        self.palette = SymbolPalette(left, on_start_drag=self._on_palette_drag_start)
+        self.palette = SymbolPalette(left, on_start_drag=self._on_palette_drag_start,
+                                     on_find_similar=self._find_similar)
         self.palette.pack(fill="both", expand=True)
 
-        folder = DEFAULT_SYMBOLS_DIR
+        folder = compute_default_symbols_dir()
         if not os.path.isdir(folder):
             folder = filedialog.askdirectory(title="Select symbols folder")
             if not folder:
@@ -620,17 +1575,93 @@ class App(tk.Tk):
                 self.destroy()
                 return
         self.current_folder = folder
-        self.palette.load_folder(folder)
+        self.index = None    # opened in _finish_startup, once the window is on screen
+        self._sim = None  # SimilarityIndex, built on first use
+        self._ingest = None  # IngestJob of the upload in progress
 
         self.board = BoardCanvas(center)
-        self.board.pack(fill="both", expand=True, padx=8, pady=8)
+        xsb = ttk.Scrollbar(center, orient="horizontal")
+        ysb = ttk.Scrollbar(center, orient="vertical")
+        self.board.attach_scrollbars(xsb, ysb)
+        self.board.grid(row=0, column=0, sticky="nsew", padx=(8, 0), pady=(8, 0))
+        ysb.grid(row=0, column=1, sticky="ns", pady=(8, 0))
+        xsb.grid(row=1, column=0, sticky="ew", padx=(8, 0))
+        center.rowconfigure(0, weight=1)
+        center.columnconfigure(0, weight=1)
         self.board.focus_set()
+        self.board.bind("<<ViewChanged>>", lambda e: self.zoom_lbl.configure(text=f"{int(self.board.zoom*100)}%"))
 
         self.inspector = Inspector(right, self.board)
         self.inspector.pack(fill="both", expand=True, padx=6, pady=6)
 
-        self.status = ttk.Label(self, text=f"Folder: {self.current_folder}")
+        self.status = ttk.Label(self, text=f"Loading symbols from {self.current_folder}…")
         self.status.pack(fill="x", side="bottom")
+        self.bind("<Map>", self._on_first_map)
+        if perf is not None:
+            perf.watch_event_loop(self)
+            self.perf_overlay = PerfOverlay(self.board, perf)
+            self.perf_overlay.show()
+            self.bind_all("<F12>", lambda e: self.perf_overlay.toggle())
+            self.bind_all("<Control-F12>", lambda e: self._dump_perf())
+        kinds = parse_profile_kinds(PROFILE_KINDS)
+        self.profiler = ProfileSession(os.path.join(CACHE_DIR, "profiles"), kinds or None)
+        self.bind_all("<F9>", lambda e: self._toggle_profile())
+        if kinds:
+            self._toggle_profile()  # SYMBOL_PROFILE: capture from startup until F9 or exit
+        self.startup.mark("window built")
+
+    def _on_first_map(self, ev):
+        if ev.widget is self:
+            self.unbind("<Map>")
+            # idle callbacks run in order, so this comes after the first redraw
+            self.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        """Everything the first paint doesn't need: folder index, palette, text-tool icon."""
+        self.update_idletasks()
+        self.startup.mark("first paint")
+        self.index = SymbolIndex.open(self.current_folder)
+        self.palette.load_folder(self.current_folder, self.index)
+        self.board.images.pack = self.palette.symbol_pack
+        self.status.configure(text=f"Folder: {self.current_folder}")
+        self.update_idletasks()
+        self.startup.mark("palette (interactive)")
+        self.palette.load_text_icon()
+        self.startup.mark("text tool icon")
+        self.after(WATCH_INTERVAL_MS, self._poll_folder)
+        if STARTUP_TIMES:
+            print(self.startup.report(), file=sys.stderr)
+
+    def _index_ready(self):
+        """False (and says so) while deferred startup hasn't opened the folder index yet."""
+        if self.index is None:
+            self.status.configure(text="Still loading the symbol folder…")
+        return self.index is not None
+
+    def _folder_symbols(self):
+        """Symbols in the current folder; the palette's count until deferred startup opens the index."""
+        return len(self.index) if self.index is not None else len(self.palette.files)
+
+    def _dump_perf(self):
+        path = self.perf.dump(default_dump_path(CACHE_DIR), folder=self.current_folder,
+                              folder_symbols=self._folder_symbols(), board_items=len(self.board.placed),
+                              zoom=self.board.zoom)
+        self.status.configure(text=f"Latency samples written to {path}")
+
+    def _toggle_profile(self):
+        """F9: start profiling, or stop and write the reports."""
+        if not self.profiler.active:
+            self.profiler.start()
+            self.status.configure(text=f"Profiling ({', '.join(self.profiler.kinds)}) — press F9 to stop")
+            return
+        paths = self.profiler.stop(board=len(self.board.placed), folder=self._folder_symbols(),
+                                   zoom=f"{self.board.zoom:.2f}", path=self.current_folder)
+        self.status.configure(text=f"Profile written: {os.path.dirname(paths[0])}" if paths else "Profiling stopped")
+
+    def destroy(self):
+        if getattr(self, "profiler", None) is not None and self.profiler.active:
+            self._toggle_profile()
+        super().destroy()
 
     def _build_toolbar(self):
         tb = ttk.Frame(self)
@@ -639,46 +1670,239 @@ class App(tk.Tk):
         ttk.Button(tb, text="Upload Symbol(s)…", command=self._upload_symbols).pack(side="left", padx=4)
         ttk.Button(tb, text="Delete Selected", command=lambda: self.board._delete_selected()).pack(side="left", padx=4)
         ttk.Button(tb, text="Clear Board", command=self._clear_board).pack(side="left", padx=4)
+        ttk.Button(tb, text="Build ORBAT…", command=self._build_orbat).pack(side="left", padx=4)
+        ttk.Button(tb, text="Import Units…", command=self._import_units).pack(side="left", padx=4)
+        ttk.Separator(tb, orient="vertical").pack(side="left", fill="y", padx=6, pady=4)
+        ttk.Button(tb, text="Zoom −", width=7, command=lambda: self.board.zoom_by(1/ZOOM_STEP)).pack(side="left", padx=2)
+        self.zoom_lbl = ttk.Label(tb, text="100%", width=6, anchor="center")
+        self.zoom_lbl.pack(side="left")
+        ttk.Button(tb, text="Zoom +", width=7, command=lambda: self.board.zoom_by(ZOOM_STEP)).pack(side="left", padx=2)
+        ttk.Button(tb, text="100%", width=5, command=lambda: self.board.set_zoom(1.0)).pack(side="left", padx=2)
+        ttk.Separator(tb, orient="vertical").pack(side="left", fill="y", padx=6, pady=4)
+        self.show_grid = tk.BooleanVar(value=BoardCanvas.show_grid)
+        ttk.Checkbutton(tb, text="Grid", variable=self.show_grid,
+                        command=lambda: self.board.set_grid(show=self.show_grid.get())).pack(side="left", padx=2)
+        self.snap_grid = tk.BooleanVar(value=BoardCanvas.snap_to_grid)
+        ttk.Checkbutton(tb, text="Snap to grid", variable=self.snap_grid,
+                        command=lambda: self.board.set_grid(snap=self.snap_grid.get())).pack(side="left", padx=2)
+        self.snap_items = tk.BooleanVar(value=BoardCanvas.snap_to_items)
+        ttk.Checkbutton(tb, text="Snap to symbols", variable=self.snap_items,
+                        command=lambda: setattr(self.board, "snap_to_items", self.snap_items.get())).pack(side="left", padx=2)
+        ttk.Separator(tb, orient="vertical").pack(side="left", fill="y", padx=6, pady=4)
+        ttk.Label(tb, text="Colours:").pack(side="left", padx=(2, 0))
+        self.affiliation = tk.StringVar(value=AS_DRAWN)
+        aff = ttk.Combobox(tb, textvariable=self.affiliation, values=(AS_DRAWN,) + AFFILIATIONS, width=9, state="readonly")
+        aff.bind("<<ComboboxSelected>>", lambda e: self.board.set_affiliation(
+            None if self.affiliation.get() == AS_DRAWN else self.affiliation.get()))
+        aff.pack(side="left", padx=2)
         ttk.Button(tb, text="Exit", command=self.destroy).pack(side="right", padx=4)
+        ttk.Button(tb, text="Find Duplicates…", command=self._show_duplicates).pack(side="right", padx=4)
+        self.check_dups = tk.BooleanVar(value=CHECK_DUPLICATES_ON_UPLOAD)
+        ttk.Checkbutton(tb, text="Check uploads for duplicates", variable=self.check_dups).pack(side="right", padx=4)
+        self.normalize_uploads = tk.BooleanVar(value=NORMALIZE_UPLOADS)
+        ttk.Checkbutton(tb, text="Normalize uploads", variable=self.normalize_uploads).pack(side="right", padx=4)
         tb.pack(fill="x")
 
     def _choose_folder(self):
         folder = filedialog.askdirectory(title="Select symbols folder", initialdir=getattr(self, "current_folder", None))
         if not folder: return
         self.current_folder = folder
-        self.palette.load_folder(folder)
+        self.index = SymbolIndex.open(folder)
+        self._sim = None
+        self.board.images.clear()  # drop pyramids mapped from the old pack before it closes
+        self.board.images.pack = None
+        self.palette.load_folder(folder, self.index)
+        self.board.images.pack = self.palette.symbol_pack
+        if self.board.variants is not None:
+            self.board.variants.clear()
         self.status.configure(text=f"Folder: {self.current_folder}")
 
     def _reload(self):
         if not hasattr(self, "current_folder"):
             self._choose_folder(); return
-        self.palette.load_folder(self.current_folder)
+        if not self._index_ready():
+            return
+        self._sync_folder()
         self.status.configure(text=f"Reloaded: {self.current_folder}")
 
+    def _sync_folder(self):
+        """Patch the palette with whatever changed on disk since the last poll."""
+        added, removed, changed = self.index.refresh()
+        if added or removed or changed:
+            self.palette.apply_changes(added, removed, changed)
+            for p in removed + changed:
+                self.board.images.invalidate(p)
+                if self.board.variants is not None:
+                    self.board.variants.invalidate(p)
+            self._redraw_sources(removed + changed)
+        return added, removed, changed
+
+    def _redraw_sources(self, paths):
+        """Drop the bitmaps of board items drawn from ``paths`` and rasterize them afresh."""
+        stale = {os.path.abspath(p) for p in paths}
+        board = self.board
+        hit = [cid for cid, rec in board.placed.items()
+               if rec.kind == "image" and os.path.abspath(rec.path) in stale]
+        for cid in hit:
+            board.view.release(cid)
+        if hit:
+            board.view.refresh()
+
+    def _poll_folder(self):
+        added, removed, changed = self._sync_folder()
+        if added or removed or changed:
+            self.status.configure(text=f"Folder updated: +{len(added)} −{len(removed)} ~{len(changed)}")
+        self.after(WATCH_INTERVAL_MS, self._poll_folder)
+
     def _upload_symbols(self):
         if not hasattr(self, "current_folder"):
             self._choose_folder()
             if not hasattr(self, "current_folder"):
                 return
+        if not self._index_ready():
+            return
         paths = filedialog.askopenfilenames(
             title="Select image files to add",
             filetypes=[("Images", "*.png;*.jpg;*.jpeg;*.webp;*.bmp")]
         )
         if not paths: return
-        copied = 0
-        for p in paths:
-            try:
-                safe_copy_to_folder(p, self.current_folder)
-                copied += 1
-            except Exception as e:
-                messagebox.showwarning("Copy failed", f"Could not add {os.path.basename(p)}:\n{e}")
-        if copied:
-            self.palette.load_folder(self.current_folder)
-            self.status.configure(text=f"Uploaded {copied} file(s) → palette refreshed")
+        if self._ingest is not None:
+            messagebox.showinfo("Upload in progress", "Wait for the current upload to finish.")
+            return
+        sim = self._similarity() if self.check_dups.get() else None
+        self._ingest = IngestJob(self.current_folder, self.index.names,
+                                 normalize=self.normalize_uploads.get(),
+                                 thumb_size=THUMB_SIZE, similarity=sim).start(paths)
+        self._ingest_added, self._ingest_skipped = 0, []
+        self._collect_ingest()
+
+    def _collect_ingest(self):
+        """Fold finished uploads into the index and palette, one batch per tick."""
+        job = self._ingest
+        results = job.drain()
+        done = [r for r in results if r.dest]
+        self._ingest_skipped += [r for r in results if not r.dest]
+        if done and job.folder == self.current_folder:
+            # register the copies directly; the next poll then has nothing to rescan for them
+            added = self.index.add_many([r.dest for r in done])
+            save_trim_info(self.current_folder, {os.path.basename(r.dest): r.trim for r in done if r.trim})
+            self.palette.prime_thumbnails({r.dest: r.thumb for r in done if r.thumb is not None})
+            self.palette.apply_changes(added=added)
+            self._ingest_added += len(added)
+        if not job.done:
+            self.status.configure(text=f"Uploading… {job.received}/{job.total}")
+            self.after(INGEST_POLL_MS, self._collect_ingest)
+            return
+        self._ingest = None
+        self.status.configure(text=f"Uploaded {self._ingest_added} file(s) → palette updated")
+        if self._ingest_skipped:
+            lines = [f"{os.path.basename(r.src)}: {r.error}" for r in self._ingest_skipped[:20]]
+            if len(self._ingest_skipped) > 20:
+                lines.append(f"… and {len(self._ingest_skipped) - 20} more")
+            messagebox.showwarning("Some files were not added", "\n".join(lines))
+
+    def _similarity(self):
+        """The folder's SimilarityIndex, hashing any new or changed files first."""
+        if self._sim is None:
+            from symbol_similarity import SimilarityIndex  # NumPy loads on first use
+            self._sim = SimilarityIndex(self.index)
+        self.status.configure(text="Hashing symbols…")
+        self.update_idletasks()
+        hashed = self._sim.update()
+        self.status.configure(text=f"Hashed {hashed} new symbol(s)" if hashed else f"Folder: {self.current_folder}")
+        return self._sim
+
+    def _find_similar(self, path):
+        hits = self._similarity().similar(path)
+        self.palette.show_results([path] + [p for _, p in hits],
+                                  f"Similar to {filename_to_name(path)} ({len(hits)})")
+
+    def _show_duplicates(self):
+        groups = self._similarity().duplicates()
+        top = tk.Toplevel(self); top.title("Duplicate symbols"); top.geometry("520x420")
+        ttk.Label(top, text=f"{len(groups)} group(s) of near-identical symbols — select one to show it in the palette.",
+                  wraplength=500).pack(anchor="w", padx=10, pady=(10, 6))
+        tree = ttk.Treeview(top, show="tree")
+        sb = ttk.Scrollbar(top, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=(0, 10))
+        sb.pack(side="right", fill="y", pady=(0, 10))
+        for i, group in enumerate(groups):
+            gid = tree.insert("", "end", iid=f"g{i}", text=f"{filename_to_name(group[0])} ×{len(group)}", open=True)
+            for p in group:
+                tree.insert(gid, "end", text=os.path.basename(p))
+
+        def on_select(_ev):
+            sel = tree.selection()
+            if sel:
+                gid = sel[0] if sel[0].startswith("g") else tree.parent(sel[0])
+                group = groups[int(gid[1:])]
+                self.palette.show_results(group, f"Duplicates of {filename_to_name(group[0])} ({len(group)})")
+        tree.bind("<<TreeviewSelect>>", on_select)
 
     def _clear_board(self):
         self.board.clear_board()
 
+    def _build_orbat(self):
+        """Lay out an order of battle from a JSON or outline file and place it in one batch."""
+        if not self._index_ready():
+            return
+        path = filedialog.askopenfilename(title="Open ORBAT", filetypes=[
+            ("ORBAT files", "*.json *.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            root = load_orbat(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showerror("Build ORBAT", f"Could not read {os.path.basename(path)}:\n{e}")
+            return
+        sizes = {}
+
+        def symbol_for(node):
+            sym = self.index.resolve(node.symbol or ECHELON_SYMBOLS.get(node.echelon, node.echelon or ""))
+            if sym is None:
+                return None  # label only
+            if sym not in sizes:
+                sizes[sym] = self.board.images.get(sym).size  # decoded once, shared by every placement
+            return sym, sizes[sym]
+
+        board = self.board
+        x0, y0, _, _ = board.viewport()
+        items = orbat_to_model(board.model, root, symbol_for, origin=(x0 / board.zoom + 40, y0 / board.zoom + 40))
+        board.add_model_items(items)
+        missing = sum(1 for n in root.walk() if symbol_for(n) is None)
+        self.status.configure(text=f"ORBAT: placed {len(root)} unit(s) from {os.path.basename(path)}"
+                                   + (f"; {missing} without a matching symbol" if missing else ""))
+
+    def _import_units(self):
+        """Place every unit listed in a CSV/JSONL file (symbol, x, y, scale, text) in one batch."""
+        if not self._index_ready():
+            return
+        path = filedialog.askopenfilename(title="Import units", filetypes=[
+            ("Unit lists", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            rows, errors = read_units(path)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Import Units", f"Could not read {os.path.basename(path)}:\n{e}")
+            return
+        index, base = self.index, os.path.dirname(path)
+
+        def resolve(symbol):
+            p = os.path.join(base, symbol)  # paths are relative to the list; absolute ones pass through
+            if os.path.isfile(p):
+                return p
+            return index.resolve(symbol)
+
+        cids, missing = self.board.place_many(rows, resolve)
+        problems = errors + [f"line {r.line}: no symbol named {r.symbol!r}" for r in missing]
+        self.status.configure(text=f"Imported {len(rows) - len(missing)} unit(s) from {os.path.basename(path)}"
+                                   + (f"; {len(problems)} row(s) skipped" if problems else ""))
+        if problems:
+            more = f"\n… and {len(problems) - 20} more" if len(problems) > 20 else ""
+            messagebox.showwarning("Import Units", "Skipped rows:\n" + "\n".join(problems[:20]) + more)
+
     def _on_palette_drag_start(self, name, src, event):
         DragGhost(self, name, src, on_drop=self._on_drop_to_canvas)
 
@@ -687,4 +1911,7 @@ class App(tk.Tk):
         self.status.configure(text=f"Placed: {name}")
 
 if __name__ == "__main__":
-    App().mainloop()
+    perf = instrument_hot_paths() if PERF_ENABLED else None
+    App(perf).mainloop()
+    if perf is not None:
+        print("Latency samples written to", perf.dump(default_dump_path(CACHE_DIR)))
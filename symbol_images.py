@@ -0,0 +1,346 @@
+"""Decoded symbol images shared across placements, with a mip pyramid per source.
+
+Board items are drawn at whatever size the current zoom and item scale need.
+Resampling from the nearest pyramid level at or above that size keeps the
+LANCZOS cost proportional to the output instead of the (often large) source.
+Both classes may be used from resampling worker threads.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageChops
+
+PYRAMID_MIN_SIDE = 16      # stop halving once the longest side gets this small
+IMAGE_CACHE_CAPACITY = 512 # decoded sources kept alive by the cache itself
+HIT_ALPHA = 32             # alpha at or above which a pixel counts as part of the symbol when clicked
+HIT_SLOP_MAX = 4           # largest neighbourhood radius (level pixels) a hit test searches
+
+
+class ImagePyramid:
+    """A decoded RGBA image plus lazily built half-resolution levels.
+
+    Each level's hit mask (alpha ≥ HIT_ALPHA, one bit per pixel) is also
+    built on first use and lives as long as the pyramid.
+
+    ``levels`` seeds the pyramid with levels made elsewhere (a symbol pack);
+    they must be ``base`` followed by its successive ``reduce(2)`` halvings.
+    """
+
+    def __init__(self, base: Image.Image, levels=None):
+        self.base = base
+        self._levels = list(levels) if levels else [base]
+        self._masks = {}  # level index -> (packed bits, bytes per row)
+        self._lock = threading.Lock()  # levels are built lazily, possibly by several workers
+
+    @property
+    def size(self):
+        return self.base.size
+
+    def level(self, i: int) -> Image.Image:
+        """Level i (0 = full resolution); clamps at the smallest level."""
+        if i < len(self._levels):
+            return self._levels[i]
+        with self._lock:
+            while len(self._levels) <= i:
+                prev = self._levels[-1]
+                if max(prev.size) <= PYRAMID_MIN_SIDE:
+                    return prev
+                self._levels.append(prev.reduce(2))
+            return self._levels[i]
+
+    def levels(self):
+        """Every level down to the smallest, building any still missing."""
+        i = 0
+        while self.level(i + 1) is not self.level(i):
+            i += 1
+        return list(self._levels)
+
+    def level_index_for(self, w: int, h: int) -> int:
+        """Index of the smallest level that is still at least w × h."""
+        i = 0
+        while True:
+            nxt = self.level(i + 1)
+            if nxt is self._levels[i] or nxt.width < w or nxt.height < h:
+                return i
+            i += 1
+
+    def level_for(self, w: int, h: int) -> Image.Image:
+        return self.level(self.level_index_for(w, h))
+
+    def mask(self, i: int):
+        """(bits, stride) of level i: rows of packed bits, most significant first, 1 = solid."""
+        m = self._masks.get(i)
+        if m is None:
+            lv = self.level(i)
+            solid = lv.getchannel("A").point([0] * HIT_ALPHA + [1] * (256 - HIT_ALPHA), "1")
+            m = self._masks[i] = (solid.tobytes(), (lv.width + 7) // 8)
+        return m
+
+    def hit(self, w: int, h: int, u: float, v: float, slop: float = 0) -> bool:
+        """Whether pixel (u, v) of this image drawn at w × h is solid, or has a solid one within ``slop``.
+
+        The test reads the mask of the level the image would be resampled
+        from at that size, so it matches what is on screen.
+        """
+        if not (-slop <= u < w + slop and -slop <= v < h + slop):
+            return False
+        i = self.level_index_for(w, h)
+        lv = self.level(i)
+        bits, stride = self.mask(i)
+        sx, sy = lv.width / w, lv.height / h
+        lx, ly = int(u * sx), int(v * sy)
+        rx, ry = min(HIT_SLOP_MAX, int(slop * sx + 0.5)), min(HIT_SLOP_MAX, int(slop * sy + 0.5))
+        for y in range(max(0, ly - ry), min(lv.height, ly + ry + 1)):
+            row = y * stride
+            for x in range(max(0, lx - rx), min(lv.width, lx + rx + 1)):
+                if bits[row + (x >> 3)] & (0x80 >> (x & 7)):
+                    return True
+        return False
+
+    def render(self, w: int, h: int, resample=Image.LANCZOS) -> Image.Image:
+        """The image at exactly w × h, resampled from the closest level."""
+        src = self.level_for(w, h)
+        if src.size == (w, h):
+            return src
+        return src.resize((w, h), resample)
+
+
+class SymbolImageCache:
+    """path → ImagePyramid, decoded once and kept in LRU order.
+
+    Failed decodes yield a transparent placeholder of ``fallback_size`` so
+    callers never need their own try/except around Image.open. With a
+    ``pack`` (symbol_pack.SymbolPack) set, symbols it holds up to date are
+    mapped from it instead of decoded. With a ``shared`` store
+    (symbol_shared.SharedImageStore), symbols another process has decoded
+    are mapped from shared memory, and local decodes are published there.
+    """
+
+    def __init__(self, capacity: int = IMAGE_CACHE_CAPACITY, pack=None, shared=None):
+        self.capacity = capacity
+        self.pack = pack
+        self.shared = shared
+        self._items = OrderedDict()
+        self._lock = threading.Lock()  # decoding happens outside it
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, path: str, fallback_size=(160, 112)) -> ImagePyramid:
+        key = os.path.abspath(path)
+        with self._lock:
+            pyr = self._items.get(key)
+            if pyr is not None:
+                self._items.move_to_end(key)
+                return pyr
+        pyr = self.pack.pyramid(key) if self.pack is not None else None
+        if pyr is None and self.shared is not None:
+            pyr = self.shared.pyramid(key)
+        if pyr is None:
+            try:
+                with Image.open(path) as im:
+                    base = im.convert("RGBA")
+            except Exception:
+                base = Image.new("RGBA", fallback_size, (0, 0, 0, 0))
+            else:
+                if self.shared is not None:
+                    try:
+                        pyr = self.shared.publish(key, base)
+                    except Exception:
+                        pass  # shared memory full or gone: keep the decode to ourselves
+            pyr = pyr or ImagePyramid(base)
+        with self._lock:
+            pyr = self._items.setdefault(key, pyr)  # another thread may have won the race
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+        return pyr
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._items.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# ---------- Thumbnails & atlas ----------
+CACHE_DIR = os.getenv("SYMBOL_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "symbol_builder")
+ATLAS_PAGE_SIZE = 2048  # atlas pages are square; 441 cells of 96 px per page
+
+
+def make_thumbnail(path: str, size) -> Image.Image:
+    """RGBA thumbnail of ``path`` fitting ``size``; a grey tile if it won't decode."""
+    try:
+        with Image.open(path) as im:
+            im.draft("RGB", size)  # lets JPEG decode at reduced scale
+            im = im.convert("RGBA")
+        im.thumbnail(size, Image.LANCZOS)
+        return im
+    except Exception:
+        return Image.new("RGBA", size, (230, 230, 230, 255))
+
+
+class ThumbnailAtlas:
+    """Every thumbnail of a folder packed into a few large pages.
+
+    Each path gets a ``size`` cell with its thumbnail centred in it, so a
+    viewer only needs the page and the cell's top-left corner. Atlases are
+    cached on disk under CACHE_DIR and keyed by the folder plus the name,
+    mtime and size of every file, so any change to the folder rebuilds it.
+    """
+
+    def __init__(self, size, pages, cells):
+        self.size = tuple(size)
+        self.pages = pages  # list of RGBA images
+        self.cells = cells  # path -> (page, x, y)
+
+    def __contains__(self, path):
+        return path in self.cells
+
+    def __len__(self):
+        return len(self.cells)
+
+    @classmethod
+    def build(cls, paths, size, page_size=ATLAS_PAGE_SIZE):
+        tw, th = size
+        cols, rows = max(1, page_size // tw), max(1, page_size // th)
+        per_page = cols * rows
+        pages, cells = [], {}
+        for i, path in enumerate(paths):
+            page, slot = divmod(i, per_page)
+            if page == len(pages):
+                left = len(paths) - i  # last page only as tall as it needs to be
+                used_rows = min(rows, -(-left // cols))
+                pages.append(Image.new("RGBA", (cols * tw, used_rows * th), (0, 0, 0, 0)))
+            x, y = (slot % cols) * tw, (slot // cols) * th
+            thumb = make_thumbnail(path, size)
+            pages[page].paste(thumb, (x + (tw - thumb.width) // 2, y + (th - thumb.height) // 2))
+            cells[path] = (page, x, y)
+        return cls(size, pages, cells)
+
+    @staticmethod
+    def _cache_key(folder, paths, size, stats=None):
+        folder_key = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()[:12]
+        h = hashlib.sha1(f"{size[0]}x{size[1]}\n".encode())
+        for p in paths:
+            sig = stats(p) if stats else None
+            if sig is None:
+                try:
+                    st = os.stat(p)
+                    sig = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    sig = ("missing",)
+            h.update(f"{p}\0{sig}\n".encode("utf-8", "surrogatepass"))
+        return folder_key, h.hexdigest()[:16]
+
+    @classmethod
+    def load_cached(cls, folder, paths, size, cache_dir=CACHE_DIR, stats=None):
+        """The cached atlas for this exact file set, or None if there isn't one."""
+        folder_key, set_key = cls._cache_key(folder, paths, size, stats)
+        stem = os.path.join(cache_dir, f"atlas_{folder_key}_{set_key}")
+        try:
+            with open(stem + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            pages = []
+            for i in range(meta["pages"]):
+                with Image.open(f"{stem}_{i}.png") as im:
+                    pages.append(im.convert("RGBA"))
+            return cls(meta["size"], pages, {p: tuple(c) for p, c in meta["cells"].items()})
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, folder, paths, size, cache_dir=CACHE_DIR, stats=None):
+        """The cached atlas for this exact file set, building (and saving) it if needed.
+
+        ``stats(path) -> (mtime_ns, size)`` (e.g. SymbolIndex.stat) saves a
+        stat call per file when the caller already has them. Safe to call
+        off the UI thread: it only touches PIL images and the cache dir.
+        """
+        atlas = cls.load_cached(folder, paths, size, cache_dir, stats)
+        if atlas is not None:
+            return atlas
+        folder_key, set_key = cls._cache_key(folder, paths, size, stats)
+        stem = os.path.join(cache_dir, f"atlas_{folder_key}_{set_key}")
+        atlas = cls.build(paths, size)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # drop atlases of earlier states of the same folder
+            prefix = f"atlas_{folder_key}_"
+            for fn in os.listdir(cache_dir):
+                if fn.startswith(prefix):
+                    os.remove(os.path.join(cache_dir, fn))
+            for i, page in enumerate(atlas.pages):
+                page.save(f"{stem}_{i}.png", compress_level=1)
+            with open(stem + ".json", "w", encoding="utf-8") as f:
+                json.dump({"size": list(atlas.size), "pages": len(atlas.pages), "cells": atlas.cells}, f)
+        except OSError:
+            pass  # a read-only cache dir just means rebuilding next time
+        return atlas
+
+
+# ---------- Trimming ----------
+TRIM_WHITE_THRESHOLD = 245           # opaque pixels with every channel at/above this are background
+TRIM_INFO_FILE = "symbols_trim.json"  # per-folder record of what trimming removed
+
+
+def content_bbox(im: Image.Image, white_threshold=TRIM_WHITE_THRESHOLD):
+    """Box around the visible symbol in an RGBA image, or None if there is none.
+
+    Transparent images are cut to their alpha; fully opaque ones (PDF
+    extracts, scans) to the pixels that aren't near-white.
+    """
+    alpha = im.getchannel("A")
+    if alpha.getextrema()[0] < 255:
+        return alpha.getbbox()
+    r, g, b = im.convert("RGB").split()
+    darkest = ImageChops.darker(r, ImageChops.darker(g, b))
+    return darkest.point(lambda v: 255 if v < white_threshold else 0).getbbox()
+
+
+def trim_image(im: Image.Image, white_threshold=TRIM_WHITE_THRESHOLD):
+    """(trimmed RGBA image, trim) where trim is [left, top, right, bottom, width, height].
+
+    The box is in the original's pixels and the last two values are the
+    original size, so the symbol can be put back where it was. ``trim`` is
+    None when there was nothing to cut.
+    """
+    im = im.convert("RGBA")
+    bbox = content_bbox(im, white_threshold)
+    if not bbox or bbox == (0, 0, im.width, im.height):
+        return im, None
+    return im.crop(bbox), [*bbox, im.width, im.height]
+
+
+def load_trim_info(folder: str):
+    """{file name: trim} recorded for ``folder`` (see trim_image)."""
+    try:
+        with open(os.path.join(folder, TRIM_INFO_FILE), "r", encoding="utf-8") as f:
+            return dict(json.load(f).get("items", {}))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def save_trim_info(folder: str, updates):
+    """Merge {file name: trim} into the folder's record; None values drop an entry."""
+    if not updates:
+        return
+    info = load_trim_info(folder)
+    for name, trim in updates.items():
+        if trim is None:
+            info.pop(name, None)
+        else:
+            info[name] = list(trim)
+    path = os.path.join(folder, TRIM_INFO_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "items": info}, f, indent=1)
+    os.replace(tmp, path)
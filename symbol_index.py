@@ -0,0 +1,325 @@
+"""Symbol folder listing, the persistent index built on it, and name search.
+
+One ``os.scandir`` pass lists a folder, matches extensions case-insensitively
+and collects mtime/size in the same pass. ``SymbolIndex`` keeps that listing
+naturally sorted, saves it under the cache dir and patches it in place on
+every refresh, so startup, uploads and folder polling never re-sort or
+re-glob the whole folder. ``SymbolSearchIndex`` is a trigram index over
+symbol labels for as-you-type filtering.
+"""
+import bisect
+import hashlib
+import json
+import math
+import os
+import re
+from array import array
+
+from symbol_images import CACHE_DIR
+
+ALLOWED_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+INDEX_VERSION = 1
+
+
+def natural_key(s: str):
+    """Natural sort key: 'Unit 2' sorts before 'Unit 10'."""
+    return [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", s)]
+
+
+def filename_to_name(path: str) -> str:
+    base = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[_\-]+", " ", base).strip()
+
+
+def scan_symbol_dir(folder: str):
+    """{name: (mtime_ns, size)} for every symbol file in ``folder``, in one pass."""
+    found = {}
+    with os.scandir(folder) as it:
+        for e in it:
+            if os.path.splitext(e.name)[1].lower() not in ALLOWED_EXTS:
+                continue
+            try:
+                if not e.is_file():
+                    continue
+                st = e.stat()
+            except OSError:
+                continue  # deleted between readdir and stat
+            found[e.name] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+def load_manifest_names(folder: str):
+    """{path: name} from the folder's symbols_manifest.json, if it has one."""
+    try:
+        with open(os.path.join(folder, "symbols_manifest.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {os.path.join(folder, it["path"]): it["name"] for it in data.get("items", [])}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def list_symbol_files(folder: str):
+    """Naturally sorted paths of the symbol files in ``folder``."""
+    return [os.path.join(folder, n) for n in sorted(scan_symbol_dir(folder), key=natural_key)]
+
+
+class SymbolIndex:
+    """Naturally sorted listing of one symbol folder, persisted between runs.
+
+    ``open`` trusts the saved listing while the directory's own mtime is
+    unchanged (no per-file stat at startup); ``refresh`` rescans and reports
+    what changed, which is how the apps poll the folder.
+    """
+
+    def __init__(self, folder: str, cache_dir=CACHE_DIR, persist=True):
+        self.folder = folder
+        self.entries = {}  # name -> (mtime_ns, size)
+        self.names = []    # natural order
+        self.dir_mtime_ns = None
+        self.cache_path = None
+        self._lookup = None  # normalized name/stem/label -> file name, built on first resolve()
+        if persist:
+            key = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()[:12]
+            self.cache_path = os.path.join(cache_dir, f"index_{key}.json")
+
+    @classmethod
+    def open(cls, folder: str, **kw):
+        index = cls(folder, **kw)
+        if not index._load() or index.dir_mtime_ns != index._dir_mtime():
+            index.refresh()
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, path):
+        return os.path.basename(path) in self.entries
+
+    @property
+    def paths(self):
+        return [os.path.join(self.folder, n) for n in self.names]
+
+    def resolve(self, name: str):
+        """Path of the symbol called ``name``: a file name, stem or display label, in any case.
+
+        None when nothing in the folder matches.
+        """
+        if self._lookup is None:
+            lookup = {}
+            for n in self.names:
+                for key in (n, os.path.splitext(n)[0], filename_to_name(n)):
+                    lookup.setdefault(_normalize(key), n)
+            self._lookup = lookup
+        n = self._lookup.get(_normalize(os.path.basename(name)))
+        return None if n is None else os.path.join(self.folder, n)
+
+    def stat(self, path):
+        """(mtime_ns, size) recorded for ``path``, or None if it isn't indexed."""
+        return self.entries.get(os.path.basename(path))
+
+    def _dir_mtime(self):
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return None
+
+    def _to_paths(self, names):
+        return [os.path.join(self.folder, n) for n in names]
+
+    def refresh(self):
+        """Rescan the folder; returns (added, removed, changed) path lists."""
+        dir_mtime = self._dir_mtime()
+        try:
+            current = scan_symbol_dir(self.folder)
+        except OSError:
+            current = {}  # folder vanished or unreadable: report everything as removed
+        old = self.entries
+        added = [n for n in current if n not in old]
+        removed = [n for n in old if n not in current]
+        changed = [n for n, sig in current.items() if n in old and old[n] != sig]
+
+        if len(added) > len(self.names) // 4:
+            self.names = sorted(current, key=natural_key)
+        else:
+            if removed:
+                gone = set(removed)
+                self.names = [n for n in self.names if n not in gone]
+            for n in added:
+                bisect.insort(self.names, n, key=natural_key)
+        self.entries = current
+        if added or removed:
+            self._lookup = None
+        if added or removed or changed or dir_mtime != self.dir_mtime_ns:
+            self.dir_mtime_ns = dir_mtime
+            self.save()
+        return self._to_paths(added), self._to_paths(removed), self._to_paths(changed)
+
+    def add(self, path: str) -> bool:
+        """Record a file just written into the folder without rescanning it.
+
+        Returns False if the file was already indexed (it is re-stat'ed).
+        """
+        return bool(self.add_many([path]))
+
+    def add_many(self, paths):
+        """``add`` for a batch of files with a single save; returns the newly indexed paths."""
+        new = []
+        for path in paths:
+            name = os.path.basename(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if name not in self.entries:
+                bisect.insort(self.names, name, key=natural_key)
+                new.append(path)
+                self._lookup = None
+            self.entries[name] = (st.st_mtime_ns, st.st_size)
+        self.dir_mtime_ns = self._dir_mtime()
+        self.save()
+        return new
+
+    # ---- persistence ----
+    def _load(self) -> bool:
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("folder") != os.path.abspath(self.folder):
+                return False
+            self.names = [e[0] for e in data["entries"]]
+            self.entries = {e[0]: (e[1], e[2]) for e in data["entries"]}
+            self.dir_mtime_ns = data.get("dir_mtime_ns")
+            return True
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            return False
+
+    def save(self):
+        if not self.cache_path:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "folder": os.path.abspath(self.folder),
+            "dir_mtime_ns": self.dir_mtime_ns,
+            "entries": [[n, *self.entries[n]] for n in self.names],
+        }
+        tmp = self.cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass  # a read-only cache dir just means a full scan next time
+
+
+# ---------- Search ----------
+MIN_OVERLAP = 0.5  # share of query trigrams a label must contain to match at all
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text.lower()).split())
+
+
+def _trigrams(norm: str, open_end=False):
+    """Trigrams of each space-padded token, plus its word-start bigram.
+
+    With ``open_end`` the last token is left open on the right, so a word
+    that is still being typed matches as a prefix; the bigram lets a single
+    typed character use the postings too.
+    """
+    grams = set()
+    toks = norm.split()
+    for i, tok in enumerate(toks):
+        t = f" {tok}" if open_end and i == len(toks) - 1 else f" {tok} "
+        grams.add(t[:2])
+        grams.update(t[j:j + 3] for j in range(len(t) - 2))
+    return grams
+
+
+class SymbolSearchIndex:
+    """Typo-tolerant trigram index over symbol labels.
+
+    Postings are compact ``array('I')`` lists of document ids, viewed by
+    NumPy (imported on the first search) without copying at query time; one ``bincount`` over the query's
+    postings gives every label's trigram overlap in a single pass. Ranking
+    is query coverage, then tightness of the match, with a bonus for labels
+    that contain the query outright. Removal marks a document dead; the
+    postings are compacted once dead entries outnumber live ones.
+    """
+
+    def __init__(self):
+        self._keys = []          # doc id -> key
+        self._texts = []         # doc id -> normalized text
+        self._ngrams = array("I")
+        self._alive = bytearray()
+        self._ids = {}           # key -> live doc id
+        self._postings = {}      # trigram -> array('I') of doc ids
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def add(self, key, *texts):
+        """Index ``key`` under the given label(s), replacing any earlier entry."""
+        self.remove(key)
+        norm = _normalize(" ".join(t for t in texts if t))
+        grams = _trigrams(norm)
+        doc = len(self._keys)
+        self._keys.append(key)
+        self._texts.append(norm)
+        self._ngrams.append(len(grams))
+        self._alive.append(1)
+        self._ids[key] = doc
+        for g in grams:
+            post = self._postings.get(g)
+            if post is None:
+                post = self._postings[g] = array("I")
+            post.append(doc)
+
+    def remove(self, key):
+        doc = self._ids.pop(key, None)
+        if doc is None:
+            return
+        self._alive[doc] = 0
+        self._dead += 1
+        if self._dead > 1000 and self._dead > len(self._ids):
+            self._compact()
+
+    def _compact(self):
+        live = [(self._keys[d], self._texts[d]) for d in sorted(self._ids.values())]
+        self.__init__()
+        for key, norm in live:
+            self.add(key, norm)
+
+    def search(self, query: str, limit=None):
+        """Keys of matching labels, best first."""
+        import numpy as np  # deferred: keeps NumPy off the apps' startup path
+        q = _normalize(query)
+        if not q:
+            return []
+        grams = _trigrams(q, open_end=True)
+        n = len(self._keys)
+        posts = [np.frombuffer(self._postings[g], dtype=np.uint32) for g in grams if g in self._postings]
+        if not posts:
+            return []
+        counts = np.bincount(np.concatenate(posts), minlength=n)
+        counts[np.frombuffer(self._alive, dtype=np.uint8) == 0] = 0
+        cand = np.flatnonzero(counts >= max(1, math.ceil(len(grams) * MIN_OVERLAP)))
+        if not len(cand):
+            return []
+        shared = counts[cand].astype(np.float32)
+        doc_n = np.frombuffer(self._ngrams, dtype=np.uint32)[cand]
+        score = shared / len(grams) + 0.25 * shared / np.maximum(doc_n, 1)
+        order = cand[np.argsort(-score, kind="stable")]
+
+        # exact-substring bonus for the head of the list only
+        head = order[:max(limit or 0, 200)].tolist()
+        rank = {d: i for i, d in enumerate(head)}
+        head.sort(key=lambda d: (q not in self._texts[d], rank[d]))
+        ids = head + order[len(head):].tolist()
+        return [self._keys[d] for d in ids[:limit]]
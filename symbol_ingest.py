@@ -0,0 +1,225 @@
+"""Bulk ingestion of image files into a symbol folder on a worker pool.
+
+Each file is validated, optionally normalized (empty borders trimmed,
+converted to an RGBA PNG, capped to a maximum side) and written under a name
+reserved in memory against the folder's existing names, so no worker ever
+probes the disk for collisions. Workers also produce the palette thumbnail.
+Results are queued; the UI thread drains them in batches, so all Tk and
+index updates stay on that thread.
+
+``trim_folder`` normalizes a folder that already exists in place; run
+``python symbol_ingest.py trim FOLDER`` to crop an extracted symbol set.
+"""
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from symbol_images import make_thumbnail, save_trim_info, trim_image
+from symbol_index import ALLOWED_EXTS
+
+INGEST_WORKERS = min(8, (os.cpu_count() or 2) * 2)  # decoding releases the GIL; copies wait on I/O
+NORMALIZE_MAX_SIDE = 1024                           # longest side kept when normalizing
+
+IngestResult = namedtuple("IngestResult", "src dest error thumb trim")
+IngestResult.__doc__ = "One processed file: ``dest`` is None when ``error`` says why it was skipped."
+
+
+def safe_stem(name: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", name).strip("_") or "symbol"
+
+
+class NameReserver:
+    """Hands out collision-free file names for one folder, entirely in memory.
+
+    Names are compared case-insensitively so results are also safe on
+    Windows and macOS volumes.
+    """
+
+    def __init__(self, existing_names):
+        self._taken = {n.lower() for n in existing_names}
+        self._lock = threading.Lock()
+
+    def reserve(self, stem: str, ext: str) -> str:
+        with self._lock:
+            name = stem + ext
+            i = 1
+            while name.lower() in self._taken:
+                name = f"{stem}_{i}{ext}"
+                i += 1
+            self._taken.add(name.lower())
+            return name
+
+
+def normalize_image(im: Image.Image, max_side=NORMALIZE_MAX_SIDE):
+    """(RGBA image trimmed to its content with the longest side capped, trim); see trim_image."""
+    im, trim = trim_image(im)
+    if max_side and max(im.size) > max_side:
+        im.thumbnail((max_side, max_side), Image.LANCZOS)
+    return im, trim
+
+
+class IngestJob:
+    """Ingest many files into ``folder`` in parallel.
+
+    ``existing_names`` seeds the collision check (e.g. ``SymbolIndex.names``).
+    With ``similarity`` (a SimilarityIndex, already up to date) files that
+    look like a library symbol, or like a file accepted earlier in the same
+    job, are skipped as duplicates.
+    """
+
+    def __init__(self, folder, existing_names, normalize=False, max_side=NORMALIZE_MAX_SIDE,
+                 thumb_size=None, similarity=None, workers=INGEST_WORKERS):
+        self.folder = folder
+        self.normalize = normalize
+        self.max_side = max_side
+        self.thumb_size = thumb_size
+        self.similarity = similarity
+        self.workers = workers
+        self.names = NameReserver(existing_names)
+        self.total = 0
+        self.received = 0  # results handed out by drain()/run()
+        self._results = queue.Queue()
+        self._pool = None
+        self._accepted = None  # MultiIndexHash of this job's files, with similarity
+        self._accepted_lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self._pool is not None and self.received >= self.total
+
+    def start(self, paths):
+        os.makedirs(self.folder, exist_ok=True)
+        self.total = len(paths)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        for src in paths:
+            self._pool.submit(self._run_one, src)
+        self._pool.shutdown(wait=False)
+        return self
+
+    def drain(self, limit=256):
+        """Results finished since the last call (at most ``limit``); never blocks."""
+        out = []
+        while len(out) < limit:
+            try:
+                out.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        self.received += len(out)
+        return out
+
+    def run(self, paths):
+        """Ingest synchronously (scripts and tests); returns every result."""
+        self.start(paths)
+        out = []
+        while len(out) < self.total:
+            out.append(self._results.get())
+        self.received = len(out)
+        return out
+
+    def _run_one(self, src):
+        try:
+            result = self._ingest(src)
+        except Exception as e:
+            result = IngestResult(src, None, str(e) or e.__class__.__name__, None, None)
+        self._results.put(result)
+
+    def _duplicate_of(self, src):
+        """What ``src`` duplicates (a library file, or an earlier file of this job), or None.
+
+        A file that duplicates nothing is recorded for the rest of the job in
+        the same locked step, so of two near-identical uploads only one gets in.
+        """
+        # NumPy only loads with the similarity index
+        from symbol_similarity import DUPLICATE_RADIUS, MultiIndexHash, hash_files
+        h = hash_files([src])[0]
+        if h is None:
+            return None
+        hits = self.similarity.mih.query(h, DUPLICATE_RADIUS)
+        if hits:
+            return os.path.basename(hits[0][1])
+        with self._accepted_lock:
+            if self._accepted is None:
+                self._accepted = MultiIndexHash()
+            hits = self._accepted.query(h, DUPLICATE_RADIUS)
+            if hits:
+                return f"{os.path.basename(hits[0][1])} in this upload"
+            self._accepted.add(src, h)
+        return None
+
+    def _ingest(self, src):
+        stem, ext = os.path.splitext(os.path.basename(src))
+        ext = ext.lower()
+        if ext not in ALLOWED_EXTS:
+            return IngestResult(src, None, "unsupported file type", None, None)
+        with Image.open(src) as im:
+            im.verify()  # header + checksums, without a full decode
+
+        if self.similarity is not None:
+            dup = self._duplicate_of(src)
+            if dup is not None:
+                return IngestResult(src, None, f"duplicate of {dup}", None, None)
+
+        thumb = trim = None
+        if self.normalize:
+            with Image.open(src) as im:
+                norm, trim = normalize_image(im, self.max_side)
+            dest = os.path.join(self.folder, self.names.reserve(safe_stem(stem), ".png"))
+            norm.save(dest, optimize=False)
+            if self.thumb_size:
+                thumb = norm.copy()
+                thumb.thumbnail(self.thumb_size, Image.LANCZOS)
+        else:
+            dest = os.path.join(self.folder, self.names.reserve(safe_stem(stem), ext))
+            shutil.copy2(src, dest)
+            if self.thumb_size:
+                thumb = make_thumbnail(dest, self.thumb_size)
+        return IngestResult(src, dest, None, thumb, trim)
+
+
+LOSSLESS_EXTS = {".png", ".webp", ".bmp"}  # formats trim_folder rewrites in place
+
+
+def trim_folder(folder, names=None, workers=INGEST_WORKERS):
+    """Crop every lossless symbol file in ``folder`` to its content, in place.
+
+    Offsets go to the folder's trim record; already trimmed files are left
+    untouched, so running it twice is harmless. JPEGs are skipped rather
+    than re-encoded. Returns {name: trim} for the files that changed.
+    """
+    if names is None:
+        names = os.listdir(folder)
+    names = [n for n in names if os.path.splitext(n)[1].lower() in LOSSLESS_EXTS]
+
+    def trim_one(name):
+        path = os.path.join(folder, name)
+        try:
+            with Image.open(path) as im:
+                fmt = im.format
+                trimmed, trim = trim_image(im)
+        except Exception:
+            return name, None
+        if trim is not None:
+            tmp = path + ".tmp"
+            opts = {"lossless": True} if fmt == "WEBP" else {}  # Pillow's WebP default is lossy
+            trimmed.save(tmp, format=fmt, **opts)
+            os.replace(tmp, path)
+        return name, trim
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        changed = {n: t for n, t in pool.map(trim_one, names) if t is not None}
+    save_trim_info(folder, changed)
+    return changed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "trim":
+        sys.exit("usage: python symbol_ingest.py trim FOLDER")
+    done = trim_folder(sys.argv[2])
+    print(f"Trimmed {len(done)} file(s) in {sys.argv[2]}")
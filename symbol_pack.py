@@ -0,0 +1,198 @@
+"""Symbol packs: a whole library pre-decoded into one memory-mapped file.
+
+    python symbol_pack.py [FOLDER] [-o OUT]     # writes FOLDER/symbols.pack
+
+A pack holds every symbol of a folder as raw RGBA: the full-resolution
+image, the same half-resolution levels ImagePyramid would build, and a
+palette thumbnail. Opening one maps the file read-only and reads only its
+index. Images are wrapped around regions of the mapping with
+``Image.frombuffer``, so nothing is decoded or copied until a level is
+actually resampled. Processes that open the same pack share its pages
+through the OS page cache.
+
+Each entry records the source file's mtime and size. An entry whose
+source has changed since the build is ignored, and that symbol is decoded
+from its file as usual. Rebuild the pack after editing the folder to get
+it back up to date; a folder without a pack works exactly as before.
+
+Layout (little-endian): a 64-byte header (magic, version, offset and
+length of the index), the pixel blocks, each 64-byte aligned, then the
+index as JSON.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from symbol_images import ImagePyramid, make_thumbnail
+from symbol_index import list_symbol_files
+
+PACK_FILE = "symbols.pack"  # default pack location inside a symbol folder
+PACK_MAGIC = b"SYMPACK\0"
+PACK_VERSION = 1
+PACK_THUMB_SIZE = (96, 96)  # the v12 palette's THUMB_SIZE
+HEADER = struct.Struct("<8sIQQ")  # magic, version, index offset, index length
+DATA_START = 64
+ALIGN = 64
+
+
+def _decode(path, thumb_size):
+    """(levels, thumbnail) of one file, or None if it won't decode."""
+    try:
+        with Image.open(path) as im:
+            base = im.convert("RGBA")
+    except Exception:
+        return None
+    return ImagePyramid(base).levels(), make_thumbnail(path, thumb_size)
+
+
+def build_pack(folder, out=None, thumb_size=PACK_THUMB_SIZE, workers=None):
+    """Write the pack of ``folder`` (default ``folder/symbols.pack``); returns (path, entries, skipped).
+
+    Files are decoded on a thread pool and written in folder order. The pack
+    is written next to its final name and moved into place, so readers never
+    see a half-written file.
+    """
+    out = out or os.path.join(folder, PACK_FILE)
+    paths = list_symbol_files(folder)
+    entries, skipped = {}, []
+    tmp = out + ".tmp"
+    with open(tmp, "wb") as f, ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        f.write(bytes(DATA_START))
+
+        def put(im):
+            pad = -f.tell() % ALIGN
+            f.write(bytes(pad))
+            off = f.tell()
+            f.write(im.tobytes())
+            return [off, im.width, im.height]
+
+        for path, decoded in zip(paths, pool.map(lambda p: _decode(p, thumb_size), paths)):
+            if decoded is None:
+                skipped.append(path)
+                continue
+            levels, thumb = decoded
+            st = os.stat(path)
+            entries[os.path.basename(path)] = {
+                "sig": [st.st_mtime_ns, st.st_size],
+                "levels": [put(im) for im in levels],
+                "thumb": put(thumb),
+            }
+        index = json.dumps({"thumb_size": list(thumb_size), "entries": entries},
+                           separators=(",", ":")).encode("utf-8")
+        index_off = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, index_off, len(index)))
+    os.replace(tmp, out)
+    return out, len(entries), skipped
+
+
+class SymbolPack:
+    """A read-only view of one pack file; images share its memory mapping.
+
+    Lookups take the symbol's path in the pack's folder. ``entry`` checks the
+    file's current mtime and size against the recorded ones (pass ``sig`` to
+    skip the stat when the caller already has it).
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.folder = os.path.dirname(self.path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_off, index_len = HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {PACK_VERSION} symbol pack")
+        meta = json.loads(self._mm[index_off:index_off + index_len])
+        self.thumb_size = tuple(meta["thumb_size"])
+        self.entries = meta["entries"]  # file name -> {"sig", "levels", "thumb"}
+        self._view = memoryview(self._mm)
+
+    @classmethod
+    def find(cls, folder):
+        """The pack stored in ``folder``, or None if it has none (or an unreadable one)."""
+        path = os.path.join(folder, PACK_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return self.entry(path) is not None
+
+    def entry(self, path, sig=None):
+        """The up-to-date entry for ``path``, or None."""
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.folder:
+            return None
+        e = self.entries.get(os.path.basename(path))
+        if e is None:
+            return None
+        if sig is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            sig = (st.st_mtime_ns, st.st_size)
+        return e if list(sig) == e["sig"] else None
+
+    def _image(self, block):
+        off, w, h = block
+        # frombuffer with the raw RGBA decoder maps the bytes as they are: no decode, no copy
+        return Image.frombuffer("RGBA", (w, h), self._view[off:off + w * h * 4], "raw", "RGBA", 0, 1)
+
+    def pyramid(self, path, sig=None):
+        """An ImagePyramid over the packed levels of ``path``, or None."""
+        e = self.entry(path, sig)
+        if e is None:
+            return None
+        levels = [self._image(b) for b in e["levels"]]
+        return ImagePyramid(levels[0], levels)
+
+    def thumbnail(self, path, size=PACK_THUMB_SIZE, sig=None):
+        """The packed thumbnail of ``path`` if it was made at ``size``, or None."""
+        if tuple(size) != self.thumb_size:
+            return None
+        e = self.entry(path, sig)
+        return self._image(e["thumb"]) if e is not None else None
+
+    def close(self):
+        """Unmap the file, or leave it to the last image still taken from the pack."""
+        try:
+            self._view.release()
+            self._mm.close()
+        except BufferError:
+            pass  # an image still maps part of the file; the mapping is freed with it
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("folder", nargs="?", default=os.getenv("SYMBOLS_DIR") or os.path.join(here, "extracted_symbols"))
+    ap.add_argument("-o", "--out", help=f"pack file to write (default: FOLDER/{PACK_FILE})")
+    ap.add_argument("--workers", type=int, default=None, help="decoding threads (default: one per core)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    out, count, skipped = build_pack(args.folder, args.out, workers=args.workers)
+    ms = (time.perf_counter() - t0) * 1000.0
+    print(f"Packed {count} symbols into {out} ({os.path.getsize(out) / 2**20:.1f} MiB) in {ms:.0f} ms")
+    for path in skipped:
+        print(f"  skipped (won't decode): {os.path.basename(path)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
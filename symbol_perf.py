@@ -0,0 +1,279 @@
+"""Opt-in latency instrumentation for the Tk apps.
+
+``PerfRecorder.instrument`` swaps a class attribute for a timing wrapper,
+so nothing is wrapped (and nothing costs anything) unless instrumentation is
+switched on before the widgets are built. Durations go into fixed-size
+ring buffers per label; a heartbeat on the Tk event loop records how late
+each tick fires, which is what a user perceives as lag. ``PerfOverlay``
+shows p50/p95/p99 over the board and ``dump`` writes raw samples as JSON.
+
+``ProfileSession`` is the heavier tool: it runs a set of profilers (cProfile
+and tracemalloc out of the box, others can be registered in PROFILERS)
+around one interaction and writes their reports under a common file stem.
+"""
+import functools
+import json
+import os
+import time
+import tkinter as tk
+import tracemalloc
+from array import array
+
+PERF_ENABLED = os.getenv("SYMBOL_PERF", "0") == "1"
+RING_SIZE = 4096           # samples kept per label
+HEARTBEAT_MS = 16          # event-loop probe period (~one frame)
+OVERLAY_REFRESH_MS = 500
+STALL_LABEL = "event loop stall"
+
+
+class LatencyRing:
+    """The last ``capacity`` samples (ms) in a preallocated array."""
+
+    def __init__(self, capacity=RING_SIZE):
+        self._buf = array("d", bytes(8 * capacity))
+        self._next = 0
+        self.count = 0  # samples ever recorded
+
+    def add(self, ms):
+        self._buf[self._next] = ms
+        self._next = (self._next + 1) % len(self._buf)
+        self.count += 1
+
+    def values(self):
+        """Kept samples, oldest first."""
+        if self.count < len(self._buf):
+            return self._buf[:self.count].tolist()
+        return self._buf[self._next:].tolist() + self._buf[:self._next].tolist()
+
+    def percentiles(self, qs=(50, 95, 99)):
+        s = sorted(self.values())
+        if not s:
+            return {}
+        return {q: s[min(len(s) - 1, int(len(s) * q / 100))] for q in qs}
+
+
+class PerfRecorder:
+    """Per-label latency rings fed by instrumented methods and the loop heartbeat."""
+
+    def __init__(self, capacity=RING_SIZE):
+        self.capacity = capacity
+        self.rings = {}
+        self.started = time.time()
+
+    def record(self, label, ms):
+        ring = self.rings.get(label)
+        if ring is None:
+            ring = self.rings[label] = LatencyRing(self.capacity)
+        ring.add(ms)
+
+    def instrument(self, cls, name, label=None):
+        """Time every call of ``cls.name``; do this before instances bind the method."""
+        orig = getattr(cls, name)
+        label = label or f"{cls.__name__}.{name}"
+        record, clock = self.record, time.perf_counter
+
+        @functools.wraps(orig)
+        def timed(*args, **kw):
+            t0 = clock()
+            try:
+                return orig(*args, **kw)
+            finally:
+                record(label, (clock() - t0) * 1000.0)
+        setattr(cls, name, timed)
+
+    def watch_event_loop(self, widget, interval_ms=HEARTBEAT_MS):
+        """Record how late each ``after`` tick runs: time the loop was blocked."""
+        expected = interval_ms / 1000.0
+        last = [time.perf_counter()]
+
+        def tick():
+            now = time.perf_counter()
+            self.record(STALL_LABEL, max(0.0, (now - last[0] - expected) * 1000.0))
+            last[0] = now
+            widget.after(interval_ms, tick)
+        widget.after(interval_ms, tick)
+
+    def summary(self):
+        """{label: {count, p50, p95, p99, max}} in ms."""
+        out = {}
+        for label, ring in sorted(self.rings.items()):
+            vals = ring.values()
+            p = ring.percentiles()
+            out[label] = {"count": ring.count, "p50": p.get(50), "p95": p.get(95), "p99": p.get(99),
+                          "max": max(vals) if vals else None}
+        return out
+
+    def dump(self, path, **context):
+        """Write summary plus raw samples to ``path`` (JSON); extra keywords are stored as context."""
+        data = {
+            "started": self.started,
+            "dumped": time.time(),
+            "context": context,
+            "summary": self.summary(),
+            "samples_ms": {label: ring.values() for label, ring in self.rings.items()},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return path
+
+
+class StartupTimer:
+    """Named checkpoints measured from ``t0`` (a perf_counter value taken at launch)."""
+
+    def __init__(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.marks = []
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter()))
+
+    def report(self):
+        lines = ["startup breakdown (ms):"]
+        prev = self.t0
+        for label, t in self.marks:
+            lines.append(f"  {label:22} +{(t - prev) * 1000:7.1f}  {(t - self.t0) * 1000:8.1f}")
+            prev = t
+        return "\n".join(lines)
+
+
+def default_dump_path(cache_dir):
+    return os.getenv("SYMBOL_PERF_FILE") or os.path.join(
+        cache_dir, time.strftime("perf-%Y%m%d-%H%M%S.json"))
+
+
+class PerfOverlay:
+    """Small p50/p95/p99 readout pinned to the top-right corner of ``parent``."""
+
+    def __init__(self, parent, recorder, refresh_ms=OVERLAY_REFRESH_MS):
+        self.recorder = recorder
+        self.refresh_ms = refresh_ms
+        self.label = tk.Label(parent, justify="left", anchor="nw", font=("Consolas", 9),
+                              bg="#202020", fg="#e8e8e8", padx=6, pady=4)
+        self.visible = False
+        self._job = None
+
+    def toggle(self):
+        self.show(not self.visible)
+
+    def show(self, on=True):
+        self.visible = on
+        if on:
+            self.label.place(relx=1.0, x=-8, y=8, anchor="ne")
+            self._update()
+        else:
+            self.label.place_forget()
+            if self._job is not None:
+                self.label.after_cancel(self._job)
+                self._job = None
+
+    def _update(self):
+        lines = [f"{'':24} {'n':>6} {'p50':>7} {'p95':>7} {'p99':>7}"]
+        for label, s in self.recorder.summary().items():
+            if s["count"]:
+                lines.append(f"{label[-24:]:24} {s['count']:6d} {s['p50']:7.1f} {s['p95']:7.1f} {s['p99']:7.1f}")
+        self.label.configure(text="\n".join(lines) if len(lines) > 1 else "no samples yet")
+        self._job = self.label.after(self.refresh_ms, self._update)
+
+
+# ---------- Profiling sessions ----------
+PROFILE_KINDS = os.getenv("SYMBOL_PROFILE", "")  # "1"/"all", or a comma list such as "cpu,mem"
+PROFILE_TOP = 40       # rows in the text reports
+TRACE_FRAMES = 8       # traceback depth tracemalloc keeps per allocation
+
+
+class CpuProfiler:
+    """cProfile of the UI thread; writes a .pstats file and a cumulative-time summary."""
+    name = "cpu"
+
+    def start(self):
+        import cProfile  # profiling modules stay off the startup path
+        self._prof = cProfile.Profile()
+        self._prof.enable()
+
+    def stop(self, stem, header):
+        import io
+        import pstats
+        self._prof.disable()
+        self._prof.dump_stats(stem + ".pstats")
+        buf = io.StringIO()
+        pstats.Stats(self._prof, stream=buf).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        with open(stem + "-cpu.txt", "w", encoding="utf-8") as f:
+            f.write(header + buf.getvalue())
+        return [stem + ".pstats", stem + "-cpu.txt"]
+
+
+class AllocProfiler:
+    """tracemalloc growth between start and stop, grouped by allocating line."""
+    name = "mem"
+
+    def start(self):
+        self._owns = not tracemalloc.is_tracing()
+        if self._owns:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        self._before = tracemalloc.take_snapshot()
+
+    def stop(self, stem, header):
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._owns:
+            tracemalloc.stop()
+        skip = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        diff = after.filter_traces(skip).compare_to(self._before.filter_traces(skip), "lineno")
+        lines = [header, f"traced now {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB\n",
+                 f"top {PROFILE_TOP} allocation sites by growth:\n"]
+        lines += [f"{stat}\n" for stat in diff[:PROFILE_TOP]]
+        with open(stem + "-mem.txt", "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        return [stem + "-mem.txt"]
+
+
+PROFILERS = {"cpu": CpuProfiler, "mem": AllocProfiler}
+
+
+def parse_profile_kinds(spec):
+    """Profiler names from an env-style spec; empty when profiling is off."""
+    spec = (spec or "").strip().lower()
+    if spec in ("", "0"):
+        return []
+    if spec in ("1", "all"):
+        return list(PROFILERS)
+    return [k for k in (p.strip() for p in spec.split(",")) if k in PROFILERS]
+
+
+class ProfileSession:
+    """Start/stop a set of profilers; reports share one stem tagged with the context."""
+
+    def __init__(self, out_dir, kinds=None):
+        self.out_dir = out_dir
+        self.kinds = list(kinds or PROFILERS)
+        self._running = None
+        self._t0 = None
+
+    @property
+    def active(self):
+        return self._running is not None
+
+    def start(self):
+        if self.active:
+            return
+        self._running = [PROFILERS[k]() for k in self.kinds]
+        self._t0 = time.perf_counter()
+        for prof in self._running:
+            prof.start()
+
+    def stop(self, **context):
+        """Stop and write the reports; keyword context (board size, folder…) tags them."""
+        if not self.active:
+            return []
+        elapsed = time.perf_counter() - self._t0
+        running, self._running = self._running, None
+        tag = "".join(f"-{k}{v}" for k, v in context.items() if isinstance(v, int))
+        stem = os.path.join(self.out_dir, time.strftime("profile-%Y%m%d-%H%M%S") + tag)
+        header = "".join(f"{k}: {v}\n" for k, v in context.items()) + f"captured: {elapsed:.2f} s\n\n"
+        os.makedirs(self.out_dir, exist_ok=True)
+        paths = []
+        for prof in reversed(running):  # reverse start order: each sees as little of the others as possible
+            paths += prof.stop(stem, header)
+        return paths
@@ -0,0 +1,104 @@
+"""Affiliation colouring of symbols, vectorized with NumPy.
+
+Doctrine fills a unit's frame with its affiliation colour (friendly crystal
+blue, hostile red, …). Symbols extracted from the reference PDF are black
+line art on white. ``recolor`` maps each pixel's luminance through a
+256-entry table running from the palette's line colour (for black) to its
+fill colour (for white), so line work stays dark, the background takes the
+fill, and anti-aliased edges blend between the two. Alpha is kept.
+
+``VariantCache`` keeps recoloured variants per (symbol, affiliation, size)
+along with the plain resample they were made from, so switching a board's
+affiliation recolours already-sized images instead of resampling again.
+"""
+import functools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+AFFILIATION_PALETTES = {  # affiliation -> (line colour, fill colour), APP-6 / MIL-STD-2525 light fills
+    "Friendly": ((0, 0, 0), (128, 224, 255)),
+    "Hostile": ((0, 0, 0), (255, 128, 128)),
+    "Neutral": ((0, 0, 0), (170, 255, 170)),
+    "Unknown": ((0, 0, 0), (255, 255, 128)),
+}
+VARIANT_CACHE_BYTES = 256 * 2**20  # RGBA pixels kept across all variants
+PIXEL = np.dtype("<u4")  # an RGBA pixel read as one little-endian word: R in the low byte, A in the high
+ALPHA_MASK = np.uint32(0xFF000000)
+
+
+def fill_color(affiliation):
+    """The affiliation's fill as a Tk/PIL "#rrggbb" colour, or None."""
+    pal = AFFILIATION_PALETTES.get(affiliation)
+    return "#%02x%02x%02x" % pal[1] if pal else None
+
+
+@functools.lru_cache(maxsize=None)
+def _lut(affiliation):
+    """256 packed RGB words (alpha 0) running from the line colour to the fill colour."""
+    line, fill = (np.array(c, dtype=np.float32) for c in AFFILIATION_PALETTES[affiliation])
+    t = np.arange(256, dtype=np.float32)[:, None] / 255.0
+    rgb = np.rint(line + t * (fill - line)).astype(np.uint32)
+    return (rgb[:, 0] | rgb[:, 1] << 8 | rgb[:, 2] << 16).astype(PIXEL)
+
+
+def recolor(im, affiliation):
+    """``im`` in the affiliation's colours: luminance → line…fill ramp, alpha unchanged."""
+    if im.mode != "RGBA":
+        im = im.convert("RGBA")
+    words = np.asarray(im).view(PIXEL)[..., 0]  # (h, w) packed pixels, no copy
+    out = _lut(affiliation)[np.asarray(im.convert("L"))]  # one table lookup for every pixel
+    out |= words & ALPHA_MASK
+    return Image.frombuffer("RGBA", im.size, out, "raw", "RGBA", 0, 1)
+
+
+class VariantCache:
+    """(path, affiliation, w, h) → RGBA image in LRU order, bounded by pixel bytes.
+
+    ``render()`` makes the plain image at w × h on a miss; it is cached under
+    affiliation None and recoloured for the others. Safe to use from
+    several threads; two threads missing the same key both do the work.
+    """
+
+    def __init__(self, max_bytes=VARIANT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, path, affiliation, w, h, render):
+        key = (path, affiliation, w, h)
+        with self._lock:
+            im = self._items.get(key)
+            if im is not None:
+                self._items.move_to_end(key)
+                return im
+        if affiliation is None:
+            im = render()
+        else:
+            im = recolor(self.get(path, None, w, h, render), affiliation)
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = im
+                self.bytes += im.width * im.height * 4
+                while self.bytes > self.max_bytes and len(self._items) > 1:
+                    _, old = self._items.popitem(last=False)
+                    self.bytes -= old.width * old.height * 4
+        return im
+
+    def invalidate(self, path):
+        """Drop every variant of ``path`` (its file changed)."""
+        with self._lock:
+            for key in [k for k in self._items if k[0] == path]:
+                old = self._items.pop(key)
+                self.bytes -= old.width * old.height * 4
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
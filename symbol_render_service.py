@@ -0,0 +1,320 @@
+"""Local render service: composite symbol specs in, PNG bytes out.
+
+    python symbol_render_service.py [--folder DIR] [--port 8765 | --unix PATH] [--workers N]
+
+Endpoints:
+
+    POST /render      body: a placeholderapp ``SymbolCanvas.to_json`` spec  -> image/png
+    GET  /render?spec=<url-encoded JSON>                                 -> image/png
+    GET  /metrics     request counts, cache hit rate, throughput and p50/p95/p99 latency (JSON)
+    GET  /healthz     "ok"
+
+Rendering runs in a pool of worker processes, each holding its own
+CompositeRenderer (and icon cache). Finished PNGs go into one LRU shared by
+every connection, bounded by bytes. Identical requests that arrive while a
+render is in progress wait for that render instead of starting another.
+Connections are HTTP/1.1 keep-alive. Everything is local: stdlib plus
+Pillow, no network access beyond the listening socket.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from composite_render import CompositeRenderer, normalize_spec, spec_key
+from symbol_perf import LatencyRing
+
+DEFAULT_PORT = 8765
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # leave a core for the connection threads
+CACHE_BYTES = 64 * 2**20   # rendered PNGs kept
+MAX_BODY = 64 * 1024       # largest accepted spec
+RENDER_TIMEOUT = 30        # seconds a request waits for its render
+THROUGHPUT_WINDOW = 60     # seconds covered by the recent-throughput figure
+
+
+# ---------- Worker processes ----------
+_renderer = None
+
+
+def _init_worker(folder):
+    global _renderer
+    _renderer = CompositeRenderer(folder)
+
+
+def _render(spec):
+    """Worker side: (PNG bytes, render time in ms)."""
+    t0 = time.perf_counter()
+    png = _renderer.render_png(spec)
+    return png, (time.perf_counter() - t0) * 1000.0
+
+
+def _ping():
+    return os.getpid()
+
+
+# ---------- Shared state ----------
+class ResponseCache:
+    """LRU of rendered PNGs bounded by total size; concurrent misses on one key render once."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._items = OrderedDict()  # key -> PNG bytes
+        self._inflight = {}          # key -> Future of the render in progress
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_or_render(self, key, submit):
+        """(png, cache hit?, render ms or None when this request didn't render)."""
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return png, True, None
+            self.misses += 1
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[key] = submit()
+        try:
+            png, render_ms = fut.result(RENDER_TIMEOUT)
+        except BaseException:
+            if owner:
+                with self._lock:
+                    self._inflight.pop(key, None)
+            raise
+        if owner:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._store(key, png)
+        return png, False, render_ms if owner else None
+
+    def _store(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        self._items[key] = png
+        self.bytes += len(png)
+        while self.bytes > self.max_bytes:
+            _, old = self._items.popitem(last=False)
+            self.bytes -= len(old)
+
+    def stats(self):
+        with self._lock:
+            looked_up = self.hits + self.misses
+            return {"entries": len(self._items), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / looked_up, 4) if looked_up else None,
+                    "in_flight": len(self._inflight)}
+
+
+class Metrics:
+    """Request counters, latency rings and a sliding throughput window."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.total = 0
+        self.by_status = {}
+        self.request_ms = LatencyRing()
+        self.render_ms = LatencyRing()
+        self._recent = deque()  # completion times within THROUGHPUT_WINDOW
+        self._lock = threading.Lock()
+
+    def record(self, status, ms, render_ms=None):
+        now = time.time()
+        with self._lock:
+            self.total += 1
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+            self.request_ms.add(ms)
+            if render_ms is not None:
+                self.render_ms.add(render_ms)
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    @staticmethod
+    def _latency(ring):
+        p = ring.percentiles()
+        vals = ring.values()
+        return {"count": ring.count, "p50": p.get(50), "p95": p.get(95), "p99": p.get(99),
+                "max": max(vals) if vals else None}
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            while self._recent and self._recent[0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+            uptime = now - self.started
+            window = min(THROUGHPUT_WINDOW, uptime) or 1.0
+            return {
+                "uptime_s": round(uptime, 1),
+                "requests": {"total": self.total, "by_status": {str(k): v for k, v in sorted(self.by_status.items())}},
+                "throughput_rps": {"overall": round(self.total / (uptime or 1.0), 2),
+                                   f"last_{THROUGHPUT_WINDOW}s": round(len(self._recent) / window, 2)},
+                "latency_ms": {"request": self._latency(self.request_ms), "render": self._latency(self.render_ms)},
+            }
+
+
+# ---------- HTTP ----------
+class RenderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: every response carries a Content-Length
+    server_version = "SymbolRender/1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/render":
+            spec = parse_qs(url.query).get("spec", [None])[0]
+            if spec is None:
+                return self._error(400, "missing ?spec=")
+            return self._render(spec)
+        if url.path == "/metrics":
+            data = self.server.metrics.snapshot()
+            data["cache"] = self.server.cache.stats()
+            data["workers"] = self.server.workers
+            return self._send(200, json.dumps(data, indent=2).encode("utf-8"), "application/json", record=False)
+        if url.path == "/healthz":
+            return self._send(200, b"ok", "text/plain", record=False)
+        self._error(404, "not found")
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.close_connection = True  # can't tell where the next request starts
+            return self._error(411, "Content-Length required")
+        if length > MAX_BODY:
+            self.close_connection = True  # the unread body can't be skipped safely
+            return self._error(413, "spec too large")
+        body = self.rfile.read(length)  # read even when unused, so keep-alive stays in step
+        if urlsplit(self.path).path != "/render":
+            return self._error(404, "not found")
+        self._render(body)
+
+    def _render(self, raw):
+        t0 = time.perf_counter()
+        try:
+            spec = normalize_spec(json.loads(raw))
+        except ValueError as e:  # also covers JSON errors
+            return self._error(400, str(e), t0)
+        key = spec_key(spec)
+        etag = '"%s"' % hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", None, t0, {"ETag": etag})
+        server = self.server
+        try:
+            png, hit, render_ms = server.cache.get_or_render(key, lambda: server.pool.submit(_render, spec))
+        except Exception as e:
+            return self._error(500, f"render failed: {e.__class__.__name__}: {e}", t0)
+        self._send(200, png, "image/png", t0, {"ETag": etag, "X-Cache": "HIT" if hit else "MISS"}, render_ms)
+
+    def _error(self, status, message, t0=None):
+        self._send(status, (message + "\n").encode("utf-8"), "text/plain; charset=utf-8", t0)
+
+    def _send(self, status, body, ctype, t0=None, headers=None, render_ms=None, record=True):
+        self.send_response(status)
+        if ctype:
+            self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        if record:
+            ms = (time.perf_counter() - t0) * 1000.0 if t0 is not None else 0.0
+            self.server.metrics.record(status, ms, render_ms)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+class _RenderService:
+    """The pool, cache and metrics, mixed into a TCP or Unix-socket threading server."""
+    daemon_threads = True
+
+    def setup_service(self, folder, workers=RENDER_WORKERS, cache_bytes=CACHE_BYTES, verbose=False):
+        self.workers = workers
+        self.verbose = verbose
+        self.cache = ResponseCache(cache_bytes)
+        self.metrics = Metrics()
+        # spawned workers: forking a process that already runs connection threads is unsafe
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(folder,))
+        for fut in [self.pool.submit(_ping) for _ in range(workers)]:
+            fut.result()  # start the workers now, not on the first request
+        return self
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class TCPRenderServer(_RenderService, ThreadingHTTPServer):
+    pass
+
+
+class UnixRenderServer(_RenderService, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)  # stale socket from an earlier run
+        super().server_bind()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def make_server(folder, host="127.0.0.1", port=DEFAULT_PORT, unix=None, **kw):
+    """A ready, bound server (call serve_forever); ``unix`` selects a Unix socket path instead of TCP."""
+    if unix:
+        server = UnixRenderServer(unix, RenderHandler)
+    else:
+        server = TCPRenderServer((host, port), RenderHandler)
+    return server.setup_service(folder, **kw)
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--folder", default=os.getenv("SYMBOLS_DIR") or os.path.join(here, "extracted_symbols"))
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    ap.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    ap.add_argument("--cache-mb", type=int, default=CACHE_BYTES // 2**20)
+    ap.add_argument("--verbose", action="store_true", help="log every request")
+    args = ap.parse_args(argv)
+
+    server = make_server(args.folder, args.host, args.port, args.unix, workers=args.workers,
+                         cache_bytes=args.cache_mb * 2**20, verbose=args.verbose)
+    where = args.unix or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Rendering {args.folder} with {args.workers} worker(s) on {where}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Decoded symbol images shared between app instances through shared memory.
+
+Every instance that opens the store (v12 with SHARED_IMAGES=1) looks a
+symbol up here before decoding it. If another instance has already decoded
+it, the pyramid levels are mapped straight out of that instance's segment.
+After a local decode the levels are published for the others. Each symbol
+lives in its own ``multiprocessing.shared_memory`` segment. The segment
+name comes from the file's path, mtime and size, so an edited file gets a
+new segment rather than stale pixels.
+
+A small control segment lists every published symbol and the PIDs of the
+attached instances; a lock file in CACHE_DIR serialises changes to it. Each
+instance registers on open and leaves on exit. The last one out unlinks
+every segment, and PIDs of instances that died without leaving are pruned
+on the next open. (On Windows the OS already frees a segment with its last
+handle; there the bookkeeping only decides what to publish.)
+"""
+import atexit
+import hashlib
+import os
+import struct
+import threading
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from symbol_images import CACHE_DIR, ImagePyramid
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+    from multiprocessing import resource_tracker
+
+SHARED_IMAGE_BYTES = int(os.getenv("SHARED_IMAGE_MB", 1024)) * 2**20  # cap on published pixels
+SHARED_SLOTS = 4096       # symbols the control segment can list
+MAX_INSTANCES = 32        # attached processes tracked for cleanup
+CTL_MAGIC = b"SYMSHM1\0"
+SEG_MAGIC = b"SYMSEG1\0"
+CTL_HEADER = struct.Struct("<8sIQ")    # magic, used slots, used bytes
+PIDS_AT = 64
+SLOTS_AT = PIDS_AT + 4 * MAX_INSTANCES
+KEY_SIZE = 8                           # bytes of the sha1 naming each segment
+SEG_HEADER = struct.Struct("<8sII")    # magic, ready flag, level count
+SEG_LEVEL = struct.Struct("<QII")      # offset, width, height
+ALIGN = 64
+
+
+def _open_shm(name, create=False, size=0):
+    """A segment that this process's resource tracker won't unlink behind the other instances' backs."""
+    try:
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name, create=create, size=size)
+        if os.name != "nt":
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _unlink(shm):
+    """Destroy a segment opened with _open_shm (a no-op on Windows)."""
+    if os.name == "nt":
+        return
+    if getattr(shm, "_track", True):  # before 3.13 unlink() unregisters what _open_shm already did
+        resource_tracker.register(shm._name, "shared_memory")
+    shm.unlink()
+
+
+def _take_view(shm):
+    """Close ``shm`` but keep its mapping, as a memoryview owned by the caller.
+
+    Images made with frombuffer pin the mapping; holding the view rather than
+    the SharedMemory object lets the object go without tripping over them.
+    """
+    view, shm._buf, shm._mmap = shm._buf, None, None
+    shm.close()
+    return view
+
+
+def _alive(pid):
+    if os.name == "nt":
+        return True  # os.kill would terminate it; the OS frees segments there anyway
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _StoreLock:
+    """Cross-process lock on a file, also held against the other threads of this process."""
+
+    def __init__(self, path):
+        self._file = open(path, "a+b")
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if os.name == "nt":
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if os.name == "nt":
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def close(self):
+        self._file.close()
+
+
+class SharedImageStore:
+    """Published symbol pyramids, keyed by file path, mtime and size."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=SHARED_IMAGE_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        # one store per user: segment names are global, the cache dir is not
+        self.prefix = "sym" + hashlib.sha1(os.path.abspath(cache_dir).encode("utf-8")).hexdigest()[:8]
+        self.max_bytes = max_bytes
+        self._lock = _StoreLock(os.path.join(cache_dir, self.prefix + ".lock"))
+        self._segments = {}  # name -> memoryview of a mapped segment, kept while its images may be in use
+        self._attach_lock = threading.Lock()
+        self._closed = False
+        with self._lock:
+            try:
+                self._ctl = _open_shm(self.prefix + "ctl")
+            except FileNotFoundError:
+                self._ctl = _open_shm(self.prefix + "ctl", create=True, size=SLOTS_AT + KEY_SIZE * SHARED_SLOTS)
+                self._ctl.buf[:SLOTS_AT] = bytes(SLOTS_AT)
+                CTL_HEADER.pack_into(self._ctl.buf, 0, CTL_MAGIC, 0, 0)
+            pids = [p for p in self._pids() if _alive(p)]
+            if os.getpid() not in pids and len(pids) < MAX_INSTANCES:
+                pids.append(os.getpid())
+            self._set_pids(pids)
+        atexit.register(self.close)
+
+    @classmethod
+    def open(cls, **kw):
+        """The workstation's store, or None where shared memory isn't available."""
+        try:
+            return cls(**kw)
+        except (OSError, ValueError, ImportError):
+            return None
+
+    # ---------- control segment (callers hold the lock) ----------
+    def _pids(self):
+        return [p for p in struct.unpack_from(f"<{MAX_INSTANCES}I", self._ctl.buf, PIDS_AT) if p]
+
+    def _set_pids(self, pids):
+        struct.pack_into(f"<{MAX_INSTANCES}I", self._ctl.buf, PIDS_AT, *(pids + [0] * (MAX_INSTANCES - len(pids))))
+
+    def _slots(self):
+        _, used, _ = CTL_HEADER.unpack_from(self._ctl.buf, 0)
+        return [bytes(self._ctl.buf[SLOTS_AT + i * KEY_SIZE:SLOTS_AT + (i + 1) * KEY_SIZE]) for i in range(used)]
+
+    # ---------- segments ----------
+    @staticmethod
+    def _key(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return hashlib.sha1(f"{path}\0{st.st_mtime_ns}\0{st.st_size}".encode("utf-8", "surrogatepass")).digest()[:KEY_SIZE]
+
+    def _name(self, key):
+        return self.prefix + key.hex()
+
+    @staticmethod
+    def _ready(buf):
+        magic, ready, _ = SEG_HEADER.unpack_from(buf, 0)
+        return magic == SEG_MAGIC and ready
+
+    @staticmethod
+    def _pyramid(buf):
+        _, _, count = SEG_HEADER.unpack_from(buf, 0)
+        levels = []
+        for i in range(count):
+            off, w, h = SEG_LEVEL.unpack_from(buf, SEG_HEADER.size + i * SEG_LEVEL.size)
+            levels.append(Image.frombuffer("RGBA", (w, h), buf[off:off + w * h * 4], "raw", "RGBA", 0, 1))
+        return ImagePyramid(levels[0], levels)
+
+    def pyramid(self, path):
+        """The published pyramid of ``path`` (absolute), mapped without copying, or None."""
+        key = self._key(path)
+        if key is None or self._closed:
+            return None
+        name = self._name(key)
+        with self._attach_lock:
+            view = self._segments.get(name)
+            if view is None:
+                try:
+                    shm = _open_shm(name)
+                except (FileNotFoundError, OSError, ValueError):
+                    return None
+                if not self._ready(shm.buf):  # still being written by its publisher
+                    shm.close()
+                    return None
+                view = self._segments[name] = _take_view(shm)
+        return self._pyramid(view)
+
+    def publish(self, path, base):
+        """Copy ``base`` and all its levels into a new segment; returns a pyramid over it, or None.
+
+        None means another thread or instance is publishing the same file,
+        or the store is full; keep the local pyramid then.
+        """
+        key = self._key(path)
+        if key is None or self._closed:
+            return None
+        levels = ImagePyramid(base).levels()
+        offsets, pos = [], SEG_HEADER.size + SEG_LEVEL.size * len(levels)
+        for im in levels:
+            pos += -pos % ALIGN
+            offsets.append(pos)
+            pos += im.width * im.height * 4
+        name = self._name(key)
+        with self._lock:
+            _, used, used_bytes = CTL_HEADER.unpack_from(self._ctl.buf, 0)
+            if used >= SHARED_SLOTS or used_bytes + pos > self.max_bytes:
+                return None
+            try:
+                shm = _open_shm(name, create=True, size=pos)
+            except (FileExistsError, OSError):
+                return None
+            self._ctl.buf[SLOTS_AT + used * KEY_SIZE:SLOTS_AT + (used + 1) * KEY_SIZE] = key
+            CTL_HEADER.pack_into(self._ctl.buf, 0, CTL_MAGIC, used + 1, used_bytes + pos)
+        # pixels are copied outside the lock; readers skip the segment until it is marked ready
+        SEG_HEADER.pack_into(shm.buf, 0, SEG_MAGIC, 0, len(levels))
+        for i, (im, off) in enumerate(zip(levels, offsets)):
+            SEG_LEVEL.pack_into(shm.buf, SEG_HEADER.size + i * SEG_LEVEL.size, off, im.width, im.height)
+            shm.buf[off:off + im.width * im.height * 4] = im.tobytes()
+        SEG_HEADER.pack_into(shm.buf, 0, SEG_MAGIC, 1, len(levels))
+        view = _take_view(shm)
+        with self._attach_lock:
+            self._segments[name] = view
+        return self._pyramid(view)
+
+    def stats(self):
+        with self._lock:
+            _, used, used_bytes = CTL_HEADER.unpack_from(self._ctl.buf, 0)
+            return {"symbols": used, "bytes": used_bytes, "instances": len(self._pids()),
+                    "attached": len(self._segments)}
+
+    def close(self):
+        """Leave the store; the last instance to leave unlinks every segment."""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            pids = [p for p in self._pids() if p != os.getpid() and _alive(p)]
+            self._set_pids(pids)
+            names = [self._name(k) for k in self._slots()] if not pids else []
+            if not pids:
+                CTL_HEADER.pack_into(self._ctl.buf, 0, CTL_MAGIC, 0, 0)
+            for name in names:
+                try:
+                    shm = _open_shm(name)
+                except (FileNotFoundError, OSError):
+                    continue
+                _unlink(shm)  # mappings still in use stay valid until they go
+                shm.close()
+            if not pids:
+                _unlink(self._ctl)
+        self._ctl.close()
+        self._segments.clear()
+        self._lock.close()
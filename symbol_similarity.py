@@ -0,0 +1,243 @@
+"""Perceptual hashes of the symbol library and fast near-duplicate lookup.
+
+Hashes are 64-bit pHashes (DCT of a 32×32 grey thumbnail), computed for whole
+batches of images with a couple of NumPy matrix products and cached on disk
+next to the folder's SymbolIndex. Lookups use multi-index hashing: each hash
+is split into four 16-bit chunks with one table per chunk. Two hashes within
+Hamming distance r must agree on at least one chunk to within r // 4 bits,
+so a query probes a few table buckets instead of scanning the library.
+"""
+import hashlib
+import json
+import os
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+from symbol_images import CACHE_DIR
+
+HASH_VERSION = 1
+DUPLICATE_RADIUS = 4  # bits; at or below this two files are treated as the same symbol
+SIMILAR_RADIUS = 12   # bits; "find similar" cut-off
+HASH_BATCH = 512      # images decoded and hashed per NumPy batch
+
+_DCT_SIDE = 32
+_CHUNKS = 4
+_CHUNK_BITS = 16
+
+
+def _grey_tiles(paths, side):
+    """(N, side, side) float32 tiles with alpha flattened onto white, plus an ok mask."""
+    tiles = np.zeros((len(paths), side, side), dtype=np.float32)
+    ok = np.zeros(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            with Image.open(path) as im:
+                im.draft("RGB", (side * 4, side * 4))
+                rgba = im.convert("RGBA")
+            flat = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+            flat.alpha_composite(rgba)
+            tiles[i] = np.asarray(flat.convert("L").resize((side, side), Image.LANCZOS), dtype=np.float32)
+            ok[i] = True
+        except Exception:
+            pass
+    return tiles, ok
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+def _pack_bits(bits):
+    """(N, 64) bools → N unsigned 64-bit hashes (first bit is the most significant)."""
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64).ravel()
+
+
+def phash_tiles(tiles):
+    """pHash of every (32, 32) tile: sign of the low 8×8 DCT terms against their median."""
+    d = _dct_matrix(tiles.shape[-1])
+    coeffs = d @ tiles @ d.T  # batched 2-D DCT
+    low = coeffs[:, :8, :8].reshape(len(tiles), 64)
+    med = np.median(low[:, 1:], axis=1)  # skip the DC term
+    return _pack_bits(low > med[:, None])
+
+
+def hash_files(paths, batch=HASH_BATCH):
+    """pHash per path (Python int), or None where the file won't decode."""
+    out = []
+    for start in range(0, len(paths), batch):
+        chunk = paths[start:start + batch]
+        tiles, ok = _grey_tiles(chunk, _DCT_SIDE)
+        hashes = phash_tiles(tiles)
+        out.extend(int(h) if good else None for h, good in zip(hashes, ok))
+    return out
+
+
+def _flip_masks(bits, max_weight):
+    """Every ``bits``-wide mask with at most ``max_weight`` bits set."""
+    masks = [0]
+    for w in range(1, max_weight + 1):
+        for combo in combinations(range(bits), w):
+            m = 0
+            for b in combo:
+                m |= 1 << b
+            masks.append(m)
+    return masks
+
+
+class MultiIndexHash:
+    """64-bit hashes in four 16-bit chunk tables for sub-linear radius queries."""
+
+    def __init__(self):
+        self.hashes = {}  # key -> hash
+        self._tables = [defaultdict(set) for _ in range(_CHUNKS)]
+        self._masks = {}  # chunk radius -> flip masks
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @staticmethod
+    def _chunks(h):
+        mask = (1 << _CHUNK_BITS) - 1
+        return [(h >> (c * _CHUNK_BITS)) & mask for c in range(_CHUNKS)]
+
+    def add(self, key, h):
+        self.remove(key)
+        self.hashes[key] = h
+        for table, v in zip(self._tables, self._chunks(h)):
+            table[v].add(key)
+
+    def remove(self, key):
+        h = self.hashes.pop(key, None)
+        if h is None:
+            return
+        for table, v in zip(self._tables, self._chunks(h)):
+            bucket = table[v]
+            bucket.discard(key)
+            if not bucket:
+                del table[v]
+
+    def query(self, h, radius):
+        """[(distance, key)] of stored hashes within ``radius`` bits, nearest first."""
+        s = radius // _CHUNKS
+        masks = self._masks.get(s)
+        if masks is None:
+            masks = self._masks[s] = _flip_masks(_CHUNK_BITS, s)
+        cands = set()
+        for table, v in zip(self._tables, self._chunks(h)):
+            for m in masks:
+                bucket = table.get(v ^ m)
+                if bucket:
+                    cands.update(bucket)
+        hits = []
+        for key in cands:
+            d = (h ^ self.hashes[key]).bit_count()
+            if d <= radius:
+                hits.append((d, key))
+        hits.sort(key=lambda t: t[0])
+        return hits
+
+    def groups(self, radius):
+        """Connected groups (size ≥ 2) of keys linked by distance ≤ ``radius``."""
+        parent = {}
+
+        def find(k):
+            root = parent.setdefault(k, k)
+            while parent[root] != root:
+                root = parent[root]
+            while parent[k] != root:  # path compression
+                parent[k], k = root, parent[k]
+            return root
+
+        for key, h in self.hashes.items():
+            for _, other in self.query(h, radius):
+                if other != key:
+                    a, b = find(key), find(other)
+                    if a != b:
+                        parent[a] = b
+        groups = defaultdict(list)
+        for key in parent:
+            groups[find(key)].append(key)
+        return [g for g in groups.values() if len(g) > 1]
+
+
+class SimilarityIndex:
+    """Cached pHashes for one symbol folder, kept in step with its SymbolIndex."""
+
+    def __init__(self, symbol_index, cache_dir=CACHE_DIR):
+        self.symbols = symbol_index
+        self.mih = MultiIndexHash()
+        self._sigs = {}  # name -> (mtime_ns, size) the cached hash was computed from
+        key = hashlib.sha1(os.path.abspath(symbol_index.folder).encode("utf-8")).hexdigest()[:12]
+        self.cache_path = os.path.join(cache_dir, f"phash_{key}.json")
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.symbols.folder, name)
+
+    def update(self):
+        """Hash new or changed files and forget removed ones; returns how many were hashed."""
+        entries = self.symbols.entries
+        for name in [n for n in self._sigs if n not in entries]:
+            del self._sigs[name]
+            self.mih.remove(self._path(name))
+        todo = [n for n, sig in entries.items() if self._sigs.get(n) != sig]
+        for name, h in zip(todo, hash_files([self._path(n) for n in todo])):
+            self._sigs[name] = entries[name]
+            if h is None:
+                self.mih.remove(self._path(name))
+            else:
+                self.mih.add(self._path(name), h)
+        if todo:
+            self._save()
+        return len(todo)
+
+    def similar(self, path, radius=SIMILAR_RADIUS):
+        """[(distance, path)] of library files that look like ``path`` (itself excluded)."""
+        h = self.mih.hashes.get(path)
+        if h is None:
+            h = hash_files([path])[0]
+            if h is None:
+                return []
+        return [(d, k) for d, k in self.mih.query(h, radius) if k != path]
+
+    def duplicates(self, radius=DUPLICATE_RADIUS):
+        """Groups of library paths that are (near-)identical, each group in natural order."""
+        order = {p: i for i, p in enumerate(self.symbols.paths)}
+        groups = [sorted(g, key=lambda p: order.get(p, 0)) for g in self.mih.groups(radius)]
+        return sorted(groups, key=lambda g: order.get(g[0], 0))
+
+    # ---- persistence ----
+    def _load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != HASH_VERSION:
+                return
+            for name, mtime_ns, size, h in data["entries"]:
+                self._sigs[name] = (mtime_ns, size)
+                if h is not None:
+                    self.mih.add(self._path(name), int(h, 16))
+        except (OSError, ValueError, KeyError, TypeError):
+            self._sigs.clear()
+            self.mih = MultiIndexHash()
+
+    def _save(self):
+        rows = []
+        for name, sig in self._sigs.items():
+            h = self.mih.hashes.get(self._path(name))
+            rows.append([name, *sig, None if h is None else f"{h:016x}"])
+        tmp = self.cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": HASH_VERSION, "entries": rows}, f, separators=(",", ":"))
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass  # a read-only cache dir just means rehashing next time
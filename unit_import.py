@@ -0,0 +1,104 @@
+"""Bulk unit import: CSV/JSONL rows → BoardModel items.
+
+Each row names a symbol (library name, file name or path), a world
+position, and optionally a scale and a text. A row with a text but no
+symbol becomes a text box; with both, the text is a label under the symbol.
+Symbols are resolved through the caller's lookup (``SymbolIndex.resolve`` in
+the app), and each distinct file's size is read from its header once, so
+nothing is decoded here; the board decodes what it actually shows.
+
+CSV needs a header row, e.g.::
+
+    symbol,x,y,scale,text
+    Infantry,400,300,0.5,1 BN
+    ,520,300,,HQ
+"""
+import csv
+import json
+import math
+import os
+from collections import namedtuple
+
+from PIL import Image
+
+from symbol_index import filename_to_name
+
+BASE_PX = 160     # longest side a symbol gets when the row has no scale (as when dropped from the palette)
+LABEL_SIZE = 12   # font size of a label under a symbol
+SYMBOL_KEYS = ("symbol", "name", "path")  # accepted column names for the symbol
+
+UnitRow = namedtuple("UnitRow", "symbol x y scale text line", defaults=(None, None, None))
+UnitRow.__doc__ = "One unit to place; ``x``/``y`` are world coordinates, ``line`` is its source line."
+
+
+def _number(d, key):
+    """``d[key]`` as a finite float; "nan" and "inf" parse but would poison canvas coordinates."""
+    v = float(d[key])
+    if not math.isfinite(v):
+        raise ValueError(f"{key} must be a finite number, not {d[key]!r}")
+    return v
+
+
+def _row_from(d, line):
+    symbol = next((str(d[k]).strip() for k in SYMBOL_KEYS if d.get(k) not in (None, "")), "")
+    text = d.get("text")
+    text = str(text).strip() if text not in (None, "") else None
+    if not symbol and not text:
+        raise ValueError("needs a symbol or a text")
+    scale = d.get("scale")
+    scale = _number(d, "scale") if scale not in (None, "") else None
+    if scale is not None and scale <= 0:
+        raise ValueError("scale must be positive")
+    return UnitRow(symbol, _number(d, "x"), _number(d, "y"), scale, text, line)
+
+
+def read_units(path):
+    """(rows, errors) from a .csv or .jsonl file; bad rows are reported as "line N: why"."""
+    rows, errors = [], []
+    jsonl = os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        records = enumerate(f, 1) if jsonl else enumerate(csv.DictReader(f), 2)  # CSV line 1 is the header
+        for line, d in records:
+            try:
+                if jsonl:
+                    if not d.strip():
+                        continue
+                    d = json.loads(d)
+                rows.append(_row_from({str(k).strip().lower(): v for k, v in d.items()}, line))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                errors.append(f"line {line}: {e}")
+    return rows, errors
+
+
+def add_units(model, rows, resolve, base_px=BASE_PX):
+    """Add ``rows`` to ``model`` in order; returns (new items, rows whose symbol didn't resolve).
+
+    ``resolve(symbol)`` gives a file path or None.
+    """
+    paths, sizes = {}, {}
+    items, missing = [], []
+    for row in rows:
+        row = UnitRow(*row)
+        if row.symbol:
+            if row.symbol not in paths:
+                paths[row.symbol] = resolve(row.symbol)
+            path = paths[row.symbol]
+            if path is not None and path not in sizes:
+                try:
+                    with Image.open(path) as im:  # header only
+                        sizes[path] = im.size
+                except Exception:
+                    sizes[path] = None
+            if path is None or sizes[path] is None:
+                missing.append(row)
+                continue
+            w, h = sizes[path]
+            scale = row.scale if row.scale is not None else min(1.0, base_px / max(1, w, h))
+            items.append(model.add_image(filename_to_name(path), path, (w, h), row.x, row.y, scale))
+            if row.text:
+                items.append(model.add_text(row.text, row.x, row.y + h * scale / 2 + LABEL_SIZE,
+                                            text=row.text, font_size_base=LABEL_SIZE))
+        else:
+            items.append(model.add_text(row.text, row.x, row.y, text=row.text,
+                                        scale=row.scale if row.scale is not None else 1.0))
+    return items, missing